@@ -0,0 +1,61 @@
+"""
+Memory held by the item catalog for the full items dump: the old trimmed dict + language list against the ItemTable.
+
+Usage: python -m benchmarks.catalog_memory [path to items.json]
+"""
+import gc
+import json
+import sys
+import tracemalloc
+
+from libs.item_table import ItemTable
+
+
+def legacy_catalog(data):
+    # load_optimized_data + load_language_list_ls before the ItemTable
+    trimmed_data = {}
+    for item in data:
+        if item.get("LocalizedNames") is None:
+            continue
+        trimmed_data[item["UniqueName"]] = {
+            "LocalizedNames": item["LocalizedNames"],
+            "LocalizedDescriptions": item.get("LocalizedDescriptions"),
+            "UniqueName": item["UniqueName"],
+        }
+    language_list = [
+        [name.upper(), item_id]
+        for item_id, meta in trimmed_data.items()
+        for name in meta["LocalizedNames"].values()
+    ]
+    return trimmed_data, language_list
+
+
+def compact_catalog(data):
+    return ItemTable.from_dump(data)
+
+
+def measure(build, path):
+    # The parsed dump is dropped afterwards, only what the catalog keeps alive is counted.
+    gc.collect()
+    tracemalloc.start()
+    with open(path, "r", encoding="utf-8") as fp:
+        data = json.load(fp)
+    catalog = build(data)
+    del data
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del catalog
+    return size
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "data/item_data.json"
+    before = measure(legacy_catalog, path)
+    after = measure(compact_catalog, path)
+    print(f"trimmed dict + language list: {before / 2 ** 20:8.1f} MiB")
+    print(f"ItemTable:                    {after / 2 ** 20:8.1f} MiB  ({before / after:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
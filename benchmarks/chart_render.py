@@ -0,0 +1,126 @@
+"""
+Renders per second of the Figure based chart renderer against the seaborn/pyplot charts it replaced,
+and of the new renderer from several threads at once.
+The seaborn charts are only measured when seaborn and pandas are installed.
+
+Usage: python -m benchmarks.chart_render
+"""
+import datetime
+import io
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer as timer
+
+import numpy as np
+
+from libs.constants import CITY_COLOURS, QUALITY_TIERS
+from libs.figures import render_history_chart, render_order_heatmaps
+from libs.utils import c_game_currency
+
+ROUNDS = 20
+THREADS = 4
+
+
+def sample_data():
+    cities = list(CITY_COLOURS)[:6]
+    start = np.datetime64(datetime.datetime(2026, 4, 1))
+    timestamps = start + np.arange(720) * np.timedelta64(6, "h")
+    rng = np.random.default_rng(0)
+    series = {
+        city: (timestamps, 1000 * (index + 1) + rng.integers(0, 300, len(timestamps)))
+        for index, city in enumerate(cities)
+    }
+    values = rng.integers(1000, 50000, (3, len(cities))).astype(float)
+    values[2, 1] = np.nan
+    annotations = [[f"{c_game_currency(value)}\n1h 5m" if value == value else "" for value in row] for row in values]
+    tables = [
+        ("Sell Order", values, annotations, QUALITY_TIERS[:3], cities),
+        ("Buy Order", values / 2, annotations, QUALITY_TIERS[:3], cities),
+    ]
+    return series, tables
+
+
+def legacy_history_chart(series):
+    # full_graph before the Figure renderer
+    import matplotlib.pyplot as plt
+    import pandas as pd
+    import seaborn as sns
+
+    sns.set(rc={"axes.facecolor": "black", "axes.grid": True, "grid.color": ".1", "text.color": ".65",
+                "lines.linewidth": 1})
+    city_ls = []
+    for city, (timestamps, prices) in series.items():
+        sns.lineplot(x="timestamp", y="avg_price", color=CITY_COLOURS[city],
+                     data=pd.DataFrame({"timestamp": timestamps, "avg_price": prices}))
+        city_ls.append(city)
+    locs, labels = plt.xticks()
+    plt.title("Average Item Price")
+    plt.ylabel("")
+    plt.setp(labels, rotation=20)
+    plt.legend(labels=city_ls)
+    labels = [c_game_currency(x) for x in plt.yticks()[0]]
+    plt.yticks(plt.yticks()[0], labels)
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format="png")
+    plt.close()
+    return buffer.getvalue()
+
+
+def legacy_order_heatmaps(tables):
+    # create_sell_buy_order before the Figure renderer
+    import matplotlib.pyplot as plt
+    import pandas as pd
+    import seaborn as sns
+
+    sns.set(rc={"axes.facecolor": "black", "axes.grid": True, "grid.color": ".1", "text.color": ".65"})
+    fig, ax = plt.subplots(1, len(tables), figsize=(20, 6))
+    for axx, (title, values, annotations, index, columns) in zip(ax, tables):
+        sb_map = sns.heatmap(pd.DataFrame(values, index=index, columns=columns), annot=np.array(annotations),
+                             ax=axx, fmt="", cbar=False)
+        sb_map.set_xticklabels(sb_map.get_xticklabels(), rotation=30)
+        sb_map.set_yticklabels(sb_map.get_yticklabels(), rotation=0)
+        sb_map.set_title(title)
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format="png")
+    plt.close()
+    return buffer.getvalue()
+
+
+def rate(render, data, threads=1):
+    render(data)  # warm up fonts and caches
+    start = timer()
+    if threads == 1:
+        for _ in range(ROUNDS):
+            render(data)
+    else:
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(render, [data] * ROUNDS))
+    return ROUNDS / (timer() - start)
+
+
+def main():
+    series, tables = sample_data()
+    try:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import seaborn  # noqa: F401
+        legacy = True
+    except ImportError:
+        legacy = False
+
+    for name, new, old, data in (
+            ("history chart", render_history_chart, legacy_history_chart, series),
+            ("order heatmaps", render_order_heatmaps, legacy_order_heatmaps, tables),
+    ):
+        after = rate(new, data)
+        threaded = rate(new, data, THREADS)
+        if legacy:
+            before = rate(old, data)
+            print(f"{name:15} seaborn/pyplot: {before:6.1f}/s  Figure: {after:6.1f}/s  ({after / before:.1f}x)"
+                  f"  Figure, {THREADS} threads: {threaded:6.1f}/s")
+        else:
+            print(f"{name:15} Figure: {after:6.1f}/s  Figure, {THREADS} threads: {threaded:6.1f}/s")
+
+
+if __name__ == "__main__":
+    main()
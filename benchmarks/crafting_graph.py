@@ -0,0 +1,59 @@
+"""
+Time finding what is crafted with an item by scanning every recipe of the formatted crafting data, as the
+craft command would have to, against the reverse index of the compiled CraftingGraph. Also compares the size of
+the json crafting snapshot with the graph's sections.
+
+Usage: python -m benchmarks.crafting_graph [path to the crafting items.json]
+"""
+import json
+import sys
+from timeit import default_timer as timer
+
+from libs.crafting_graph import CraftingGraph
+from libs.item_handler import crafting_entries, format_crafting_data
+
+
+def scan_used_in(itemdata, resource):
+    return [
+        item_id
+        for item_id, entry in itemdata.items()
+        if any(
+            used == resource
+            for recipe in entry["recipes"]
+            for used, _ in recipe["resources"] + recipe["currency"]
+        )
+    ]
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "data/items_crafting.json"
+    itemdata = format_crafting_data(crafting_entries(path))
+    start = timer()
+    graph = CraftingGraph.build(itemdata)
+    build = timer() - start
+    resources = [item_id for item_id in graph.ids if len(graph.consumers(graph.node(item_id)))]
+    print(f"{len(itemdata)} craftable items, {len(graph)} nodes, {len(resources)} used as resources, "
+          f"compiled in {build * 1000:.1f} ms")
+
+    start = timer()
+    scanned = {resource: scan_used_in(itemdata, resource) for resource in resources}
+    before = (timer() - start) / len(resources)
+    start = timer()
+    indexed = {
+        resource: [graph.ids[consumer] for consumer in graph.consumers(graph.node(resource))]
+        for resource in resources
+    }
+    after = (timer() - start) / len(resources)
+    # Enchanted resources listed as enchantments of their base resource (T4_PLANKS@1) are named by their market id
+    # (T4_PLANKS_LEVEL1@1) in the graph, the number of items found is compared.
+    same = all(len(scanned[resource]) == len(indexed[resource]) for resource in resources)
+    print(f"used in, scan:  {before * 1e6:9.1f} us")
+    print(f"used in, index: {after * 1e6:9.1f} us  ({before / after:.0f}x faster, same counts: {same})")
+
+    json_size = len(json.dumps(itemdata, separators=(",", ":")).encode("utf-8"))
+    graph_size = sum(memoryview(section).nbytes for section in graph.sections().values())
+    print(f"snapshot: json {json_size / 1024:.0f} KiB, graph {graph_size / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Time and peak RSS of building the item catalog and crafting data from the dumps (no snapshots):
+json.load of the whole documents as before, orjson of the whole documents, and the streamed parse.
+Every variant runs in a fresh process so peak RSS is its own.
+
+Usage: python -m benchmarks.dump_parsing [path to items.json] [path to the crafting items.json]
+"""
+import json
+import multiprocessing
+import sys
+from timeit import default_timer as timer
+
+from libs import item_handler, utils
+from libs.item_table import ItemTable
+
+
+def whole_document(loads):
+    def entries(path):
+        with open(path, "rb") as fp:
+            data = loads(fp.read())
+        for category, content in data["items"].items():
+            if isinstance(content, list):
+                for item in content:
+                    yield category, item, True
+            elif isinstance(content, dict):
+                yield category, content, False
+
+    def items(path):
+        with open(path, "rb") as fp:
+            return loads(fp.read())
+
+    return items, entries
+
+
+def run(variant, items_path, crafting_path, results):
+    if variant == "json":
+        items, entries = whole_document(json.loads)
+    elif variant == "orjson":
+        import orjson
+
+        items, entries = whole_document(orjson.loads)
+    else:
+        items, entries = utils.iter_json_array, item_handler.crafting_entries
+    baseline = utils.peak_rss_mib()
+
+    start = timer()
+    table = ItemTable.from_dump(items(items_path))
+    crafting = item_handler.format_crafting_data(entries(crafting_path))
+    results.put((variant, timer() - start, utils.peak_rss_mib() - baseline, len(table), len(crafting)))
+
+
+def main():
+    items_path = sys.argv[1] if len(sys.argv) > 1 else "data/item_data.json"
+    crafting_path = sys.argv[2] if len(sys.argv) > 2 else "data/items_crafting.json"
+    variants = ["json"]
+    try:
+        import orjson  # noqa: F401
+        variants.append("orjson")
+    except ImportError:
+        pass
+    if utils.ijson is not None:
+        variants.append("stream")
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    for variant in variants:
+        process = context.Process(target=run, args=(variant, items_path, crafting_path, results))
+        process.start()
+        process.join()
+        name, seconds, peak, items, crafting = results.get()
+        print(f"{name:7} {seconds:6.2f}s  peak RSS +{peak:6.1f} MiB  ({items} items, {crafting} craftable)")
+
+
+if __name__ == "__main__":
+    main()
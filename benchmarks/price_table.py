@@ -0,0 +1,154 @@
+"""
+Time the pandas price tables c_price_table used to build against the array backed OrderTables,
+for a full response of every city and quality. The pandas version is only measured when pandas is installed.
+
+Usage: python -m benchmarks.price_table
+"""
+import datetime
+import random
+from copy import deepcopy
+from math import nan
+from timeit import default_timer as timer
+
+import numpy as np
+
+from libs.constants import CITY_COLOURS, QUALITY_TIERS
+from libs.price_table import price_tables
+from libs.utils import c_game_currency
+
+ROUNDS = 200
+
+
+def sample_response():
+    rng = random.Random(0)
+    now = datetime.datetime.today()
+    rows = []
+    for city in CITY_COLOURS:
+        for quality in range(1, len(QUALITY_TIERS) + 1):
+            row = {"item_id": "T4_BAG", "city": city, "quality": quality}
+            for order in ("sell", "buy"):
+                seen = rng.random() > 0.2
+                row[f"{order}_price_min"] = rng.randint(1000, 900000) if seen else 0
+                row[f"{order}_price_min_date"] = (
+                    (now - datetime.timedelta(seconds=rng.randint(1, 10 ** 7))).strftime("%Y-%m-%dT%H:%M:%S")
+                    if seen else "0001-01-01T00:00:00"
+                )
+            rows.append(row)
+    return rows
+
+
+# ------- c_price_table before the OrderTables ------- #
+
+
+def last_updated(date_, now=None):
+    if date_ == "":
+        return ""
+    d1 = now or datetime.datetime.today()
+    td_object = d1 - datetime.datetime.strptime(date_, "%Y-%m-%dT%H:%M:%S")
+    seconds = int(td_object.total_seconds())
+    periods = [
+        ("y", 60 * 60 * 24 * 365),
+        ("m", 60 * 60 * 24 * 30),
+        ("d", 60 * 60 * 24),
+        ("h", 60 * 60),
+        ("min", 60),
+        ("s", 1),
+    ]
+    time_ = {"y": 0, "m": 0, "d": 0, "h": 0, "min": 0, "s": 0}
+    for period_name, period_seconds in periods:
+        if seconds > period_seconds:
+            period_value, seconds = divmod(seconds, period_seconds)
+            time_[period_name] = period_value
+
+    lis = "\n"
+    index = 0
+    for key in time_:
+        if time_[key] != 0:
+            if index == 2:
+                return lis
+            index += 1
+            if key == "min":
+                lis += f"{time_[key]}m "
+            else:
+                lis += f"{time_[key]}{key} "
+            if key == "s":
+                return lis
+    return ""
+
+
+def legacy_price_table(cdata, now=None):
+    import pandas as pd
+
+    city_table = {}
+    city_table_last_updated = {}
+    city_buy_order_table = {}
+    city_buy_table_last_updated = {}
+    for city in CITY_COLOURS:
+        city_table[city] = [nan, nan, nan, nan, nan]
+        city_table_last_updated[city] = [nan, nan, nan, nan, nan]
+        city_buy_order_table[city] = [nan, nan, nan, nan, nan]
+        city_buy_table_last_updated[city] = [nan, nan, nan, nan, nan]
+
+    for city in cdata:
+        if city["sell_price_min"] == 0:
+            city["sell_price_min"] = nan
+        if city["buy_price_min"] == 0:
+            city["buy_price_min"] = nan
+        if city["sell_price_min_date"] == "0001-01-01T00:00:00":
+            city["sell_price_min_date"] = nan
+        if city["buy_price_min_date"] == "0001-01-01T00:00:00":
+            city["buy_price_min_date"] = nan
+        city_table[city["city"]][city["quality"] - 1] = city["sell_price_min"]
+        city_buy_order_table[city["city"]][city["quality"] - 1] = city["buy_price_min"]
+        city_table_last_updated[city["city"]][city["quality"] - 1] = city["sell_price_min_date"]
+        city_buy_table_last_updated[city["city"]][city["quality"] - 1] = city["buy_price_min_date"]
+
+    tables = []
+    for prices, dates in ((city_table, city_table_last_updated), (city_buy_order_table, city_buy_table_last_updated)):
+        data = pd.DataFrame(prices, index=QUALITY_TIERS).dropna(axis=0, how="all").dropna(axis=1, how="all")
+        updated = pd.DataFrame(dates, index=QUALITY_TIERS).dropna(axis=0, how="all").dropna(axis=1, how="all")
+        updated = updated.fillna("").apply(lambda column: column.apply(last_updated, now=now), axis=0)
+        annotation = data.apply(lambda column: column.apply(c_game_currency), axis=0).fillna("")
+        tables.extend((data, annotation.add(updated, fill_value="")))
+    return tables
+
+
+def timed(func, responses):
+    start = timer()
+    for response in responses:
+        func(response)
+    return (timer() - start) / len(responses)
+
+
+def main():
+    response = sample_response()
+    sell, buy = price_tables(response)
+    print(f"{len(response)} rows, sell table {sell.values.shape}, buy table {buy.values.shape}")
+    after = timed(price_tables, [response] * ROUNDS)
+    try:
+        import pandas  # noqa: F401
+    except ImportError:
+        print(f"OrderTables: {after * 1000:7.2f} ms")
+        return
+
+    # Both builders measure the ages from the same moment, or the labels of the two runs could differ by a second.
+    now = datetime.datetime.today().replace(microsecond=0)
+    sell, buy = price_tables(response, np.datetime64(now, "s"))
+    # The old builder modifies its input, every round gets a fresh copy.
+    legacy = legacy_price_table(deepcopy(response), now)
+    # Cells without a price used to be labelled "nan", the heatmap hides them either way.
+    same = all(
+        np.array_equal(table.values, legacy[index * 2].to_numpy(), equal_nan=True)
+        and all(
+            table.annotations[row][column] == legacy[index * 2 + 1].iat[row, column]
+            for row, column in zip(*np.nonzero(~np.isnan(table.values)))
+        )
+        for index, table in enumerate((sell, buy))
+    )
+    before = timed(legacy_price_table, [deepcopy(response) for _ in range(ROUNDS)])
+    print(f"pandas:      {before * 1000:7.2f} ms")
+    print(f"OrderTables: {after * 1000:7.2f} ms  ({before / after:.1f}x faster, same tables: {same})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Compare the per candidate scoring loop with the batch scorer over every localized name of the items dump.
+
+Usage: python -m benchmarks.search_scoring [path to items.json]
+"""
+import heapq
+import json
+import sys
+from timeit import default_timer as timer
+
+from libs.compiled_libs.search_algo import batch_distance_algorithm, batch_distance_nogil, simple_distance_algorithm
+from libs.search_index import normalize_name
+
+QUERIES = ["t8 hide", "t4 bag", "hunter hood", "helmet of valor", "healing potion", "soldier armor"]
+ROUNDS = 3
+
+
+def load_names(path):
+    with open(path, "r", encoding="utf-8") as fp:
+        data = json.load(fp)
+    names = []
+    for item in data:
+        if item.get("LocalizedNames") is None:
+            continue
+        names.extend(normalize_name(name) for name in item["LocalizedNames"].values())
+    return names
+
+
+def per_candidate(query, names):
+    found = [(name, score) for name in names if (score := simple_distance_algorithm(query, name)) != 0]
+    return sorted(found, key=lambda tup: tup[1], reverse=True)[:6]
+
+
+def batched(query, names):
+    scores = batch_distance_algorithm(query, names)
+    return heapq.nlargest(6, ((name, score) for name, score in zip(names, scores) if score != 0),
+                          key=lambda tup: tup[1])
+
+
+def batched_nogil(query, names):
+    scores = batch_distance_nogil(query, names)
+    return heapq.nlargest(6, ((name, score) for name, score in zip(names, scores) if score != 0),
+                          key=lambda tup: tup[1])
+
+
+def run(func, names):
+    start = timer()
+    for _ in range(ROUNDS):
+        for query in QUERIES:
+            func(query, names)
+    return timer() - start
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "data/item_data.json"
+    names = load_names(path)
+    scored = len(names) * len(QUERIES) * ROUNDS
+    print(f"{len(names)} names, {len(QUERIES)} queries, {ROUNDS} rounds")
+    for label, func in (("per candidate loop + sort", per_candidate), ("batch + top-k", batched),
+                        ("nogil batch + top-k", batched_nogil)):
+        elapsed = run(func, names)
+        print(f"{label:<28} {elapsed:8.3f}s  {scored / elapsed:12,.0f} candidates/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,83 +1,43 @@
 import logging
-import typing
-from asyncio import gather
 
 from discord import Embed
 from discord.errors import Forbidden
 from discord.ext import commands
 
-from libs.item_handler import Item, get_history_data, load_optimized_data, load_language_list_ls
-from libs.utils import download_file_with_fallback, get_thumbnail_url, c_game_currency
+from libs.catalog import get_catalog
+from libs.crafting import CraftingSolver
+from libs.errors import ItemNotFound
+from libs.item_handler import Item
+from libs.utils import get_thumbnail_url, c_game_currency
 
 log = logging.getLogger(__name__)
 
+# Most items listed by craftwith, an embed holds about 6000 characters.
+MAX_CRAFTED_WITH = 40
 
-def load_crafting_data(data_url) -> typing.Dict:
+
+def add_lines(embed, name, lines):
     """
-    Download and format crafting data for items
+    Adds lines to an embed as fields of at most 1024 characters, the limit discord allows
     """
-    itemdata = {}
-    data = download_file_with_fallback(data_url, "data/items_crafting.json")
-    for category in data["items"]:
-        if category in (
-                "shopcategories",
-                "@xmlns:xsi",
-                "@xsi:noNamespaceSchemaLocation",
-        ):
-            continue
-        if isinstance(data["items"][category], list):
-            for item in data["items"][category]:
-                if "craftingrequirements" in item:
-                    itemdata[item["@uniquename"]] = {"tier": item["@tier"]}
-                    if "currency" in item["craftingrequirements"]:
-                        itemdata[item["@uniquename"]]["faction_cost"] = {
-                            "name": item["craftingrequirements"]["currency"][
-                                "@uniquename"
-                            ],
-                            "amount": item["craftingrequirements"]["currency"][
-                                "@amount"
-                            ],
-                        }
-                    if "silver" in item["craftingrequirements"]:
-                        itemdata[item["@uniquename"]]["silver"] = item[
-                            "craftingrequirements"
-                        ]["@silver"]
-                    if "craftresource" in item["craftingrequirements"]:
-                        itemdata[item["@uniquename"]]["craft_requirements"] = item[
-                            "craftingrequirements"
-                        ]["craftresource"]
-        elif isinstance(data["items"][category], dict):
-            item = data["items"][category]
-            itemdata[item["@uniquename"]] = {
-                "tier": item["@tier"],
-            }
-            if "@itemvalue" in item:
-                itemdata[item["@uniquename"]]['value'] = item["@itemvalue"]
-            if "@silver" in item:
-                itemdata[item["@uniquename"]]['silver_cost'] = item["craftingrequirements"]["@silver"]
-            if "craftresource" in item:
-                itemdata[item["@uniquename"]]['requirements'] = item["craftingrequirements"]["craftresource"]
-
-    log.info("Item crafting data downloaded")
-    return itemdata
+    value = ""
+    for line in lines:
+        if value and len(value) + len(line) + 1 > 1024:
+            embed.add_field(name=name, value=value, inline=False)
+            name, value = "\u200b", ""
+        value += line + "\n"
+    if value:
+        embed.add_field(name=name, value=value, inline=False)
 
 
 class Crafting(commands.Cog):
     def __init__(self, client) -> None:
         self.client = client
-        if not hasattr(self, 'item_url') or not hasattr(self, 'op_dict'):
-            self.item_url = "https://raw.githubusercontent.com/broderickhyman/ao-bin-dumps/master/formatted/items.json"
-            self.op_dict, self.dict = load_optimized_data(self.item_url)
-            self.language_list = load_language_list_ls(self.op_dict)
-            self.item_id_score = {
-                key.upper(): 0
-                for (key, value) in self.op_dict.items()
-                if "NONTRADABLE" not in key
-            }
+        self.catalog = None
+        self.solver = None
 
-        self.craft_data = load_crafting_data(
-            "https://raw.githubusercontent.com/broderickhyman/ao-bin-dumps/master/items.json"
-        )
+    async def cog_load(self) -> None:
+        self.catalog = await get_catalog()
 
     @commands.hybrid_command(aliases=["c"])
     async def craft(self, ctx, amount, *, item) -> None:
@@ -102,68 +62,44 @@ class Crafting(commands.Cog):
         item = Item(self, ctx, item=item)
         try:
             async with ctx.channel.typing():
-                item.get_matches()
-                if "@" in item.matched:
-                    await ctx.send("Enchanted Items are not supported at the moment")
-                    return
-                embed = Embed(title=f"Crafting: {item.name}")
-
-                embed.set_thumbnail(url=get_thumbnail_url(item.matched))
-                try:
-                    items_needed = self.craft_data[item.matched]
-                except KeyError:
+                await item.get_matches()
+                if item.matched is None:
+                    raise ItemNotFound(ctx)
+                if self.solver is None or self.solver.graph is not self.catalog.craft_data:
+                    # The crafting data was reloaded, plans of the old recipes are dropped with the old solver.
+                    self.solver = CraftingSolver(self.catalog.craft_data)
+                order = await self.solver.order(item.matched, amount)
+                if order is None:
                     await ctx.send("This Item is not supported")
                     return
-                if isinstance(items_needed["craft_requirements"], dict):
-                    items_needed["craft_requirements"] = [
-                        items_needed["craft_requirements"]
-                    ]
+                embed = Embed(title=f"Crafting: {item.name} x{amount}")
+                embed.set_thumbnail(url=get_thumbnail_url(item.matched))
 
-                task_list = [
-                    get_history_data(x["@uniquename"])
-                    for x in items_needed["craft_requirements"]
+                name = self.catalog.name
+                buy_lines = [
+                    f"**{name(item_id)} x{bought}** {city}: `{c_game_currency(round(price))}`"
+                    f" Total Cost: `{c_game_currency(round(price * bought))}`"
+                    for item_id, (bought, city, price) in order.buy.items()
                 ]
-                history_data = await gather(*task_list)
-                item_meta = {}
-                text2 = ""
-                total = 0
-                for ingred in history_data:
-                    for locationdata in ingred:
-                        item_meta[locationdata["item_id"]] = {}
-                    for locationdata in ingred:
-                        prices = [x["avg_price"] for x in locationdata["data"]]
-                        item_count = [x["item_count"] for x in locationdata["data"]]
-                        avg_p = sum(prices) / len(prices)
-                        avg_count = sum(item_count) / len(item_count)
-                        item_meta[locationdata["item_id"]][locationdata["location"]] = {
-                            "avg_price": avg_p,
-                            "volume": avg_count,
-                        }
-                for ingre in items_needed["craft_requirements"]:
-                    location_p = {}
-                    item_amount = int(ingre["@count"]) * amount
-                    text = f"Amount: {item_amount} Cost:\n"
-                    item_id_ = ingre["@uniquename"]
-                    for location in item_meta[item_id_]:
-                        cost = round(item_meta[item_id_][location]["avg_price"])
-                        total_cost = cost * item_amount
-                        location_p[location] = total_cost
-                        text += f"{location}: `{c_game_currency(cost)}` Volume Sold:\
-                         {c_game_currency(round(item_meta[item_id_][location]['volume'], 1))} Total Cost: `{c_game_currency(total_cost)}`\n"
-                    embed.add_field(
-                        name=self.op_dict[ingre["@uniquename"]]["LocalizedNames"]["EN-US"],
-                        value=text,
-                        inline=False,
+                add_lines(embed, "Buy:", buy_lines)
+                add_lines(embed, "Craft:", [f"{name(item_id)} x{crafts}" for item_id, crafts in order.crafts.items()])
+                if order.currency:
+                    add_lines(
+                        embed, "Currency:", [f"{name(currency)}: {count}" for currency, count in order.currency.items()]
                     )
+                if order.unpriced:
+                    add_lines(embed, "No prices for:", [name(item_id) for item_id in sorted(order.unpriced)])
 
-                    cheapest_location = min(
-                        [(location_p[x], x) for x in location_p], key=lambda t: t[0]
+                text2 = ""
+                if order.silver:
+                    text2 += f"Crafting fees: `{c_game_currency(order.silver)}`\n"
+                if order.plan.city is not None:
+                    text2 += (
+                        f"Buying it instead: {order.plan.city} `{c_game_currency(round(order.plan.buy_price))}` each,"
+                        f" `{c_game_currency(round(order.plan.buy_price * amount))}`\n"
                     )
-                    total += cheapest_location[0]
-                    text2 += f"**{self.op_dict[ingre['@uniquename']]['LocalizedNames']['EN-US']} x{item_amount}**\n \
-                    Cheapest location: {cheapest_location[1]} Price: `{c_game_currency(round(cheapest_location[0]))}`\n"
                 text2 += (
-                    f"\n ***Total Silver Cost***: ```py\n{c_game_currency(round(total))}```"
+                    f"\n ***Total Silver Cost***: ```py\n{c_game_currency(round(order.total))}```"
                 )
                 embed.add_field(name="Totals:", value=text2, inline=False)
                 embed.set_footer(text="💬 Want to help Improve the bot ? Go to: github.com/GraciousGpal/Albie")
@@ -172,6 +108,51 @@ class Crafting(commands.Cog):
             await ctx.author.send(
                 "Albie was unable to finish the command, due to missing permissions. Check your discord Settings")
 
+    @commands.hybrid_command(aliases=["cw"])
+    async def craftwith(self, ctx, *, item) -> None:
+        """
+        Lists the items that can be crafted with an item and how many of it one craft takes.
+        Example usage: .cw t4 leather
+        """
+        try:
+            log.info(f"{ctx.message.content}")
+        except TypeError:
+            pass
+        if item is None:
+            await ctx.send(
+                "Please enter an object to be searched:\n e.g  ```.cw t4 leather\n.cw <item> ```"
+            )
+            return
+        item = Item(self, ctx, item=item)
+        try:
+            async with ctx.channel.typing():
+                await item.get_matches()
+                if item.matched is None:
+                    raise ItemNotFound(ctx)
+                graph = self.catalog.craft_data
+                node = graph.node(item.matched)
+                consumers = graph.consumers(node) if node is not None else []
+                if not len(consumers):
+                    await ctx.send(f"Nothing is crafted with {item.name}")
+                    return
+                embed = Embed(title=f"Crafted with: {item.name}")
+                embed.set_thumbnail(url=get_thumbnail_url(item.matched))
+                add_lines(
+                    embed,
+                    f"{len(consumers)} items, amount per craft:",
+                    [
+                        f"{self.catalog.name(graph.ids[consumer])}: x{graph.count_in(consumer, node)}"
+                        for consumer in consumers[:MAX_CRAFTED_WITH]
+                    ],
+                )
+                if len(consumers) > MAX_CRAFTED_WITH:
+                    embed.description = f"Showing {MAX_CRAFTED_WITH} of {len(consumers)} items."
+                embed.set_footer(text="💬 Want to help Improve the bot ? Go to: github.com/GraciousGpal/Albie")
+                await ctx.send(embed=embed)
+        except Forbidden:
+            await ctx.author.send(
+                "Albie was unable to finish the command, due to missing permissions. Check your discord Settings")
+
 
 async def setup(client):
     await client.add_cog(Crafting(client))
\ No newline at end of file
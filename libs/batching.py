@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from collections import defaultdict
+
+log = logging.getLogger(__name__)
+
+# Seconds requests are collected before a batch is sent, and the longest url sent upstream.
+BATCH_WINDOW = 0.025
+MAX_URL_LENGTH = 4000
+
+
+class RequestBatcher:
+    """
+    Collects the items requested within a short window and fetches them with as few upstream requests as possible,
+    the albion-data endpoints take comma separated item lists. Results are split by item_id and handed back to
+    every caller.
+    """
+
+    def __init__(self, build_url, fetch, window=BATCH_WINDOW, max_url_length=MAX_URL_LENGTH):
+        """
+        :param build_url: function(item_ids, group) -> url of one request for those items
+        :param fetch: coroutine function(url) -> list of rows with an "item_id", None on failure
+        :param window: seconds to wait for more items before sending a batch
+        :param max_url_length: batches are split so urls stay under this length
+        """
+        self.build_url = build_url
+        self.fetch = fetch
+        self.window = window
+        self.max_url_length = max_url_length
+        self.items = 0
+        self.requests = 0
+        self._pending = defaultdict(dict)
+        self._timer = None
+        self._tasks = set()
+
+    async def get(self, item_id, group=()):
+        """
+        Get the rows of one item
+        :param item_id: item to fetch
+        :param group: extra url parameters, only items with the same group are batched together
+        :return: list of rows of this item, None if the request failed
+        """
+        loop = asyncio.get_running_loop()
+        pending = self._pending[group]
+        future = pending.get(item_id)
+        if future is None:
+            future = pending[item_id] = loop.create_future()
+            self.items += 1
+            if self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        self._timer = None
+        pending, self._pending = self._pending, defaultdict(dict)
+        for group, futures in pending.items():
+            try:
+                batches = list(self._split(list(futures), group))
+            except Exception as e:
+                # One item the url can not be built for must not hold up the others, they are sent one by one.
+                log.error(f"Could not batch {list(futures)}: {e!r}")
+                batches = [[item_id] for item_id in futures]
+            for batch in batches:
+                task = asyncio.create_task(self._send(batch, group, futures))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    def _split(self, item_ids, group):
+        batch = []
+        for item_id in item_ids:
+            if batch and len(self.build_url(batch + [item_id], group)) > self.max_url_length:
+                yield batch
+                batch = []
+            batch.append(item_id)
+        if batch:
+            yield batch
+
+    async def _send(self, batch, group, futures):
+        """
+        Fetches one batch, every future of the batch is resolved whatever happens: None if the request failed
+        """
+        self.requests += 1
+        results = {}
+        try:
+            rows = await self.fetch(self.build_url(batch, group))
+            if rows is not None and not isinstance(rows, list):
+                log.error(f"Unexpected response for {batch}: {str(rows)[:200]}")
+                rows = None
+            if rows is not None:
+                by_item = defaultdict(list)
+                for row in rows:
+                    by_item[str(row["item_id"]).upper()].append(row)
+                results = {item_id: by_item.get(str(item_id).upper(), []) for item_id in batch}
+        except Exception as e:
+            log.error(f"Batch {batch} failed: {e!r}")
+            results = {}
+        finally:
+            for item_id in batch:
+                future = futures[item_id]
+                if not future.done():
+                    future.set_result(results.get(item_id))
+
+    @property
+    def stats(self):
+        return {"items": self.items, "requests": self.requests, "waiting": len(self._tasks)}
@@ -0,0 +1,292 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict
+from time import time
+
+from libs.db import create_connection
+
+log = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """
+    Bounded least recently used cache with hit/miss counters.
+    Thread safe, searches fill it from worker threads.
+    Every clear() starts a new generation, results computed against older data are not stored.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, generation=None):
+        """
+        Store a value, dropping the least recently used entries past maxsize
+        :param generation: generation the value was computed in, ignored if the cache was cleared since
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.generation += 1
+
+    @property
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls: while a call for a key is in flight, callers with the same key await its result
+    instead of starting their own.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.saved = 0
+        self._flights = {}
+
+    def running(self, key):
+        return key in self._flights
+
+    async def do(self, key, func):
+        """
+        :param key: hashable identifying the call ie. the url
+        :param func: coroutine function making the call
+        :return: result of the shared call
+        """
+        task = self._flights.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(func())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._land(key, done))
+        else:
+            self.saved += 1
+        # One cancelled caller must not cancel the call the others are waiting on.
+        return await asyncio.shield(task)
+
+    def _land(self, key, task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away.
+            task.exception()
+
+    @property
+    def stats(self):
+        return {"calls": self.calls, "saved": self.saved, "in_flight": len(self._flights)}
+
+
+class PriceCache:
+    """
+    Cache of albion-data API responses with stale-while-revalidate:
+    - fresh entries (younger than ttl) are returned as is,
+    - stale entries (up to ttl + max_stale) are returned right away while a background task refreshes them,
+    - older or missing entries are fetched, if that fails an expired entry is served rather than nothing.
+    Entries are kept in memory, and in SQLite too when a db file is given (opened by start()) so restarts
+    start warm.
+    Encoding entries and the SQLite queries run on a worker thread, history responses run to megabytes.
+    """
+
+    def __init__(self, maxsize=5000, max_bytes=None, db_file=None):
+        """
+        :param maxsize: most entries kept in memory
+        :param max_bytes: most bytes kept in memory, counted as the size of the entries' json encoding
+        (the decoded responses take a few times more)
+        """
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        # key: (stored_at, value, size)
+        self._entries = OrderedDict()
+        self._flight = SingleFlight()
+        self._background = set()
+        self._lock = threading.Lock()
+        self.db_file = db_file
+        self.conn = None
+
+    def start(self):
+        """
+        Opens the db file if there is one. Called once the bot starts, not when imported.
+        """
+        if self.db_file is None or self.conn is not None:
+            return
+        self.conn = create_connection(self.db_file, check_same_thread=False)
+        if self.conn is not None:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS price_cache (key TEXT PRIMARY KEY, stored_at REAL, value TEXT)"
+            )
+            self.conn.commit()
+
+    def close(self):
+        if self.conn is not None:
+            with self._lock:
+                self.conn.close()
+                self.conn = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def _load(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+        if self.conn is None:
+            return None
+        entry = await asyncio.to_thread(self._read, key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def _read(self, key):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT stored_at, value FROM price_cache WHERE key = ?", (json.dumps(key),)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), len(row[1])
+
+    def _remember(self, key, entry):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= old[2]
+        self._entries[key] = entry
+        self.nbytes += entry[2]
+        while len(self._entries) > 1 and (
+                len(self._entries) > self.maxsize or (self.max_bytes is not None and self.nbytes > self.max_bytes)
+        ):
+            self.nbytes -= self._entries.popitem(last=False)[1][2]
+
+    async def store(self, key, value):
+        stored_at = time()
+        size = 0
+        if self.conn is not None or self.max_bytes is not None:
+            size = await asyncio.to_thread(self._write, key, stored_at, value)
+        self._remember(key, (stored_at, value, size))
+
+    def _write(self, key, stored_at, value):
+        """
+        Encodes an entry, saving it to SQLite when there is a db
+        :return: size of the encoded entry
+        """
+        encoded = json.dumps(value)
+        if self.conn is not None:
+            with self._lock:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO price_cache (key, stored_at, value) VALUES (?, ?, ?)",
+                    (json.dumps(key), stored_at, encoded),
+                )
+                self.conn.commit()
+        return len(encoded)
+
+    async def age(self, key):
+        """
+        Seconds since the entry was stored, None if there is no entry
+        """
+        entry = await self._load(key)
+        return None if entry is None else time() - entry[0]
+
+    async def get(self, key, fetch, ttl, max_stale):
+        """
+        Get a cached response
+        :param key: tuple identifying the request ie. ("current", item, locations)
+        :param fetch: coroutine function doing the upstream request, a None result is not cached
+        :param ttl: seconds an entry is fresh
+        :param max_stale: seconds after ttl a stale entry is still served while it is refreshed
+        :return: response data
+        """
+        entry = await self._load(key)
+        if entry is not None:
+            age = time() - entry[0]
+            if age < ttl:
+                self.hits += 1
+                return entry[1]
+            if age < ttl + max_stale:
+                self.stale_hits += 1
+                self.refresh(key, fetch)
+                return entry[1]
+
+        self.misses += 1
+        value = await self.reload(key, fetch)
+        if value is None and entry is not None:
+            # Upstream is down or throttling us, old prices beat none.
+            self.fallbacks += 1
+            return entry[1]
+        return value
+
+    def refresh(self, key, fetch):
+        """
+        Refresh an entry in the background, unless it is already being fetched
+        """
+        if self._flight.running(key):
+            return
+        task = asyncio.create_task(self.reload(key, fetch))
+        # Keep a reference until it is done, the event loop only keeps weak ones.
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def reload(self, key, fetch):
+        """
+        Fetch an entry now and store it, joining the fetch already running for it if there is one
+        :return: response data, None if the fetch failed
+        """
+        return await self._flight.do(key, lambda: self._fetch(key, fetch))
+
+    async def _fetch(self, key, fetch):
+        value = await fetch()
+        if value is not None:
+            await self.store(key, value)
+        return value
+
+    @property
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "mib": round(self.nbytes / 2 ** 20, 1),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "fallbacks": self.fallbacks,
+            "refreshing": len(self._background),
+            "coalesced": self._flight.saved,
+        }
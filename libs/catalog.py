@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from time import perf_counter
+
+from libs.cache import LRUCache
+from libs.crafting_graph import CraftingGraph
+from libs.item_handler import load_crafting_data, load_optimized_data
+from libs.item_table import ItemTable
+from libs.search_algorithms import jw_search
+from libs.search_index import FacetIndex, NameIndex
+from libs.utils import peak_rss_mib
+
+log = logging.getLogger(__name__)
+
+ITEMS_URL = "https://raw.githubusercontent.com/broderickhyman/ao-bin-dumps/master/formatted/items.json"
+CRAFTING_URL = "https://raw.githubusercontent.com/broderickhyman/ao-bin-dumps/master/items.json"
+
+_catalog = None
+_catalog_lock = asyncio.Lock()
+
+
+class ItemCatalog:
+    """
+    Item data shared by every cog: compact item table, search indexes, crafting data
+    and the search result cache. Use get_catalog() to get the process wide instance.
+    """
+
+    def __init__(self, items_url=ITEMS_URL, crafting_url=CRAFTING_URL):
+        self.items_url = items_url
+        self.crafting_url = crafting_url
+        self.items = ItemTable([], {})
+        self.craft_data = CraftingGraph.build({})
+        self.search_cache = LRUCache(maxsize=2048)
+        # Facets and name index are swapped together so a search never mixes two catalog versions.
+        self._search = (FacetIndex(()), NameIndex.build(self.items, frozenset()))
+
+    @property
+    def facets(self):
+        return self._search[0]
+
+    @property
+    def name_index(self):
+        return self._search[1]
+
+    async def load(self):
+        start = perf_counter()
+        await asyncio.gather(self.load_items(), self.load_crafting())
+        peak = peak_rss_mib()
+        log.info(
+            f"Catalog ready in {perf_counter() - start:.2f}s"
+            + (f", peak RSS {peak:.0f} MiB." if peak is not None else ".")
+        )
+
+    async def load_items(self):
+        """
+        (Re)loads the item dump and its search indexes.
+        Cached search results belong to the previous catalog and are dropped with it.
+        """
+        items, facets, name_index = await load_optimized_data(self.items_url)
+        self.items, self._search = items, (facets, name_index)
+        self.search_cache.clear()
+        log.info(f"Item catalog loaded: {len(facets.ids)} tradable items, {len(name_index)} searchable names.")
+
+    async def load_crafting(self):
+        self.craft_data = await load_crafting_data(self.crafting_url)
+
+    def search(self, name):
+        # Generation first: results of an index swapped out after this are then not cached for the new one.
+        generation = self.search_cache.generation
+        facets, name_index = self._search
+        return jw_search(name, facets, name_index, self.search_cache, generation)
+
+    def name(self, item_id, language="EN-US"):
+        return self.items.name(item_id, language)
+
+
+async def get_catalog():
+    """
+    Get the process wide item catalog, it is loaded by the first caller.
+    """
+    global _catalog
+    async with _catalog_lock:
+        if _catalog is None:
+            catalog = ItemCatalog()
+            await catalog.load()
+            _catalog = catalog
+        return _catalog
@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from time import perf_counter
+
+from libs.cache import LRUCache, SingleFlight
+
+log = logging.getLogger(__name__)
+
+# Worker processes rendering charts, charts queued or rendering at once, and seconds a caller waits for its chart.
+RENDER_WORKERS = int(os.environ.get("ALBIE_RENDER_WORKERS", 2))
+RENDER_QUEUE_SIZE = 16
+RENDER_TIMEOUT = 20
+# Rendered charts kept (about 40 KB each).
+CHART_CACHE_SIZE = 256
+
+
+def _timed(func, args):
+    # Runs in the worker process.
+    start = perf_counter()
+    return func(*args), perf_counter() - start
+
+
+def chart_key(func, args):
+    """
+    Content address of a chart: its type and a hash of the data it is drawn from
+    """
+    digest = hashlib.blake2b(pickle.dumps(args, protocol=pickle.HIGHEST_PROTOCOL), digest_size=16)
+    return func.__name__, digest.hexdigest()
+
+
+class ChartRenderer:
+    """
+    Renders charts in a pool of worker processes so the CPU time stays off the event loop.
+    Plain data goes in, png bytes come out. At most max_queue charts are queued or rendering,
+    later callers wait for a slot, and a caller gives up once timeout seconds have passed.
+    Rendered charts are cached by the hash of their data.
+    If a worker dies the pool is not started again, charts are left out until the bot restarts: forking the
+    running bot would copy its threads' locks (logging, SQLite) into children that could deadlock on them.
+    """
+
+    def __init__(self, workers=RENDER_WORKERS, max_queue=RENDER_QUEUE_SIZE, timeout=RENDER_TIMEOUT,
+                 cache_size=CHART_CACHE_SIZE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.rendered = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.render_time = 0.0
+        self.waiting = 0
+        self.queued = 0
+        self.cache = LRUCache(maxsize=cache_size)
+        self._flight = SingleFlight()
+        self._slots = asyncio.Semaphore(max_queue)
+        self._executor = None
+        self.broken = False
+
+    def start(self):
+        """
+        Starts the worker processes. Forked right away where possible, cheap while the bot is still starting up,
+        spawned workers would re-run the bot's entry point.
+        """
+        if self._executor is None and not self.broken:
+            method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context(method)
+            )
+            # A forking pool starts all its workers with the first task.
+            self._executor.submit(int)
+            log.info(f"Chart renderer started with {self.workers} worker processes ({method}).")
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def render(self, func, *args, key=None):
+        """
+        Render a chart in a worker process, charts already rendered from the same data come from the cache
+        :param func: one of the render_* functions of libs.figures
+        :param args: plain, picklable data
+        :param key: picklable data the chart is cached by, args by default. Given when args hold labels that
+        change with the time, like the age of a price, while the data they are made from does not.
+        :return: png bytes, None if the chart could not be rendered in time or the pool broke
+        """
+        key = chart_key(func, args if key is None else key)
+        png = self.cache.get(key)
+        if png is not None or self.broken:
+            return png
+        # Identical charts requested at the same time are rendered once.
+        png = await self._flight.do(key, lambda: self._render_safely(func, args))
+        if png is not None:
+            self.cache.put(key, png)
+        return png
+
+    async def _render_safely(self, func, args):
+        try:
+            return await asyncio.wait_for(self._render(func, args), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            log.warning(f"{func.__name__} timed out, {self.queued} charts queued, {self.waiting} waiting.")
+        except BrokenProcessPool as e:
+            self.failures += 1
+            log.error(f"Chart worker died, charts are off until the bot restarts: {e!r}")
+            self.broken = True
+            self.close()
+        except Exception as e:
+            self.failures += 1
+            log.error(f"{func.__name__} failed: {e!r}")
+        return None
+
+    async def _render(self, func, args):
+        loop = asyncio.get_running_loop()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.queued += 1
+        try:
+            if self.broken:
+                # The pool broke while this chart waited for a slot.
+                self._release()
+                return None
+            self.start()
+            future = self._executor.submit(_timed, func, args)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is held until the worker is done, a chart that timed out still occupies it.
+        future.add_done_callback(lambda done: loop.call_soon_threadsafe(self._release))
+
+        png, seconds = await asyncio.wrap_future(future)
+        self.rendered += 1
+        self.render_time += seconds
+        log.info(f"{func.__name__} rendered in {seconds:.3f}s, {self.queued - 1} charts queued.")
+        return png
+
+    def _release(self):
+        self.queued -= 1
+        self._slots.release()
+
+    @property
+    def stats(self):
+        return {
+            "rendered": self.rendered,
+            "avg_render_time": round(self.render_time / self.rendered, 3) if self.rendered else 0.0,
+            "queued": self.queued,
+            "waiting": self.waiting,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "broken": self.broken,
+            "cache": self.cache.stats,
+        }
+
+
+renderer = ChartRenderer()
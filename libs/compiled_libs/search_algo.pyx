@@ -4,6 +4,7 @@ import sys
 from collections import defaultdict
 
 from Levenshtein import *
+from libc.stdlib cimport free, malloc
 
 cdef class SequenceMatcher:
 	"""A SequenceMatcher-like class built on the top of Levenshtein"""
@@ -208,11 +209,16 @@ cpdef float _token_set(str s1, str s2, partial=True, force_ascii=True, full_proc
 
 	if not validate_string(p1):
 		return 0
+
+	return _token_set_tokens(set(p1.split()), p2, partial)
+
+cdef float _token_set_tokens(set tokens1, str p2, partial):
+	"""Token set ratio of already processed strings, with the tokens of the first one pulled beforehand"""
+
 	if not validate_string(p2):
 		return 0
 
 	# pull tokens
-	tokens1 = set(p1.split())
 	tokens2 = set(p2.split())
 
 	intersection = tokens1.intersection(tokens2)
@@ -264,6 +270,116 @@ cpdef list distance_algorithm(item_, str name):
 cpdef float simple_distance_algorithm(item_, str name):
 	return token_set_ratio(item_, name)
 
+cpdef list batch_distance_algorithm(str name, list candidates):
+	"""
+	Score a query against many candidates in one call, same scores as simple_distance_algorithm.
+	The query is processed and tokenized once, candidates must already be processed with full_process_v
+	(force_ascii=True) ie. the names stored in the search index.
+	:param name: raw search string
+	:param candidates: processed candidate strings
+	:return: list of scores in the same order as candidates
+	"""
+	cdef list scores = []
+	cdef str candidate
+	cdef str p1 = full_process_v(name, force_ascii=True)
+	if not validate_string(p1):
+		return [0.0] * len(candidates)
+
+	cdef set tokens1 = set(p1.split())
+	for candidate in candidates:
+		scores.append(_token_set_tokens(tokens1, candidate, False))
+	return scores
+
+cdef inline double _indel_ratio(const Py_UCS4* a, Py_ssize_t len_a, const Py_UCS4* b, Py_ssize_t len_b,
+								Py_ssize_t* row) nogil:
+	"""Same value as Levenshtein.ratio: 2 * longest common subsequence / total length"""
+	cdef Py_ssize_t i, j, diag, above
+	if len_a + len_b == 0:
+		return 1.0
+	for j in range(len_b + 1):
+		row[j] = 0
+	for i in range(len_a):
+		diag = 0
+		for j in range(len_b):
+			above = row[j + 1]
+			if a[i] == b[j]:
+				row[j + 1] = diag + 1
+			elif row[j] > above:
+				row[j + 1] = row[j]
+			diag = above
+	return 2.0 * row[len_b] / (len_a + len_b)
+
+cpdef list batch_distance_nogil(str name, list candidates):
+	"""
+	Same scores as batch_distance_algorithm, but the ratios are computed on a typed buffer with the GIL released,
+	so searches can run on a thread pool next to the event loop.
+	The token sets are still built with the GIL, every candidate adds its three strings
+	(<intersection>, <intersection><rest of query>, <intersection><rest of candidate>) to one UCS4 buffer.
+	:param name: raw search string
+	:param candidates: processed candidate strings
+	:return: list of scores in the same order as candidates
+	"""
+	cdef Py_ssize_t count = len(candidates)
+	cdef str p1 = full_process_v(name, force_ascii=True)
+	if count == 0 or not validate_string(p1):
+		return [0.0] * count
+
+	cdef set tokens1 = set(p1.split())
+	cdef list parts = []
+	cdef str candidate
+	cdef str sorted_sect
+	cdef Py_ssize_t longest = 0
+	for candidate in candidates:
+		tokens2 = set(candidate.split())
+		sorted_sect = " ".join(sorted(tokens1.intersection(tokens2)))
+		parts.append(sorted_sect)
+		parts.append((sorted_sect + " " + " ".join(sorted(tokens1.difference(tokens2)))).strip())
+		parts.append((sorted_sect + " " + " ".join(sorted(tokens2.difference(tokens1)))).strip())
+		longest = max(longest, len(parts[-1]), len(parts[-2]))
+
+	cdef bytes packed = "".join(parts).encode("utf-32-le")
+	cdef const Py_UCS4* chars = <const Py_UCS4*> (<const char*> packed)
+	cdef Py_ssize_t* bounds = <Py_ssize_t*> malloc((3 * count + 1) * sizeof(Py_ssize_t))
+	cdef Py_ssize_t* row = <Py_ssize_t*> malloc((longest + 1) * sizeof(Py_ssize_t))
+	cdef double* results = <double*> malloc(count * sizeof(double))
+	cdef Py_ssize_t i, sect, c12, c21
+	cdef double best, score
+	if bounds == NULL or row == NULL or results == NULL:
+		free(bounds)
+		free(row)
+		free(results)
+		raise MemoryError()
+
+	try:
+		bounds[0] = 0
+		for i in range(3 * count):
+			bounds[i + 1] = bounds[i] + len(parts[i])
+
+		with nogil:
+			for i in range(count):
+				sect, c12, c21 = 3 * i, 3 * i + 1, 3 * i + 2
+				# Only an empty candidate gives an empty <intersection><rest of candidate>
+				if bounds[c21 + 1] == bounds[c21]:
+					results[i] = 0
+					continue
+				best = _indel_ratio(chars + bounds[sect], bounds[sect + 1] - bounds[sect],
+									chars + bounds[c12], bounds[c12 + 1] - bounds[c12], row)
+				score = _indel_ratio(chars + bounds[sect], bounds[sect + 1] - bounds[sect],
+									 chars + bounds[c21], bounds[c21 + 1] - bounds[c21], row)
+				if score > best:
+					best = score
+				score = _indel_ratio(chars + bounds[c12], bounds[c12 + 1] - bounds[c12],
+									 chars + bounds[c21], bounds[c21 + 1] - bounds[c21], row)
+				if score > best:
+					best = score
+				results[i] = best
+
+		return [<float> results[i] for i in range(count)]
+	finally:
+		free(bounds)
+		free(row)
+		free(results)
+
 cpdef list item_search(str name, list reduced_ls, list id_list, list full_dict):
 	"""
 	Improved search with better accuracy
@@ -0,0 +1,80 @@
+"""
+Pure Python version of the search_algo extension API used by the bot.
+Only imported when the compiled extension has not been built, scores are the same but slower.
+"""
+import re
+
+try:
+    from Levenshtein import ratio
+except ImportError:
+    ratio = None
+
+NON_WORD = re.compile(r"(?ui)\W")
+BAD_CHARS = dict((i, None) for i in range(128, 256))
+
+
+def _indel_ratio(a, b):
+    """
+    Same value as Levenshtein.ratio: 2 * longest common subsequence / total length
+    """
+    if not a and not b:
+        return 1.0
+    row = [0] * (len(b) + 1)
+    for char_a in a:
+        diag = 0
+        for j, char_b in enumerate(b):
+            above = row[j + 1]
+            if char_a == char_b:
+                row[j + 1] = diag + 1
+            elif row[j] > above:
+                row[j + 1] = row[j]
+            diag = above
+    return 2.0 * row[-1] / (len(a) + len(b))
+
+
+if ratio is None:
+    ratio = _indel_ratio
+
+
+def full_process_v(s, force_ascii=False):
+    if force_ascii:
+        s = s.translate(BAD_CHARS)
+    return NON_WORD.sub(" ", s).lower().strip()
+
+
+def _token_set_tokens(tokens1, p2):
+    if not p2:
+        return 0
+    tokens2 = set(p2.split())
+
+    sorted_sect = " ".join(sorted(tokens1.intersection(tokens2)))
+    combined_1to2 = (sorted_sect + " " + " ".join(sorted(tokens1.difference(tokens2)))).strip()
+    combined_2to1 = (sorted_sect + " " + " ".join(sorted(tokens2.difference(tokens1)))).strip()
+
+    return max(
+        ratio(sorted_sect, combined_1to2),
+        ratio(sorted_sect, combined_2to1),
+        ratio(combined_1to2, combined_2to1),
+    )
+
+
+def simple_distance_algorithm(item_, name):
+    if item_ is None or name is None:
+        return 0
+    p1 = full_process_v(item_, force_ascii=True)
+    p2 = full_process_v(name, force_ascii=True)
+    if not p1:
+        return 0
+    return _token_set_tokens(set(p1.split()), p2)
+
+
+def batch_distance_algorithm(name, candidates):
+    p1 = full_process_v(name, force_ascii=True)
+    if not p1:
+        return [0.0] * len(candidates)
+    tokens1 = set(p1.split())
+    return [_token_set_tokens(tokens1, candidate) for candidate in candidates]
+
+
+# There is no GIL to release in pure Python, keep the name so callers don't have to care.
+batch_distance_nogil = batch_distance_algorithm
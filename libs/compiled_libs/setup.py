@@ -1,5 +1,16 @@
-from distutils.core import setup
+import os
 
 from Cython.Build import cythonize
+from setuptools import Extension, setup
 
-setup(ext_modules=cythonize('search_algo.pyx', language_level=3))
+# Build ahead of time (before starting the bot) with: python libs/compiled_libs/setup.py build_ext --inplace
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+setup(
+    name="albie-search-algo",
+    packages=[],
+    ext_modules=cythonize(
+        [Extension("libs.compiled_libs.search_algo", ["libs/compiled_libs/search_algo.pyx"])],
+        language_level=3,
+    ),
+)
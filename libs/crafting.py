@@ -0,0 +1,176 @@
+import asyncio
+import math
+from time import time
+
+from libs.constants import CITY_COLOURS
+from libs.item_handler import CURRENT_PRICES_TTL, get_current_data
+
+# Markets crafting materials are bought in, the black market only buys.
+BUY_CITIES = frozenset(city for city in CITY_COLOURS if city != "Black Market")
+
+
+class Plan:
+    """
+    Cheapest way to get one unit of an item: buying it in the cheapest city or crafting it with its cheapest recipe
+    (an index of the CraftingGraph's recipes). Costs are inf where there is no price.
+    """
+    __slots__ = ("item_id", "buy_price", "city", "craft_cost", "recipe")
+
+    def __init__(self, item_id, buy_price=math.inf, city=None, craft_cost=math.inf, recipe=None):
+        self.item_id = item_id
+        self.buy_price = buy_price
+        self.city = city
+        self.craft_cost = craft_cost
+        self.recipe = recipe
+
+    @property
+    def cost(self):
+        return min(self.buy_price, self.craft_cost)
+
+    @property
+    def crafted(self):
+        return self.craft_cost < self.buy_price
+
+
+class CraftOrder:
+    """
+    Everything needed to craft an amount of an item following the cheapest plans
+    """
+
+    def __init__(self, item_id, amount, plan):
+        self.item_id = item_id
+        self.amount = amount
+        self.plan = plan
+        # item_id: [amount, city, unit price]
+        self.buy = {}
+        # item_id: times crafted
+        self.crafts = {}
+        # currency: amount
+        self.currency = {}
+        self.silver = 0
+        self.unpriced = set()
+
+    @property
+    def total(self):
+        return self.silver + sum(amount * price for amount, _, price in self.buy.values())
+
+
+class CraftingSolver:
+    """
+    Prices crafting trees: every intermediate material (refined resources, artifacts, enchanted resources) is
+    either bought or crafted, whichever is cheaper, all the way down.
+    Prices of a whole tree are fetched at once so the request batcher sends them together. Plans are memoized by
+    item for as long as prices stay fresh, ingredients shared by several recipes or requests are solved once.
+    """
+
+    def __init__(self, graph, ttl=CURRENT_PRICES_TTL):
+        """
+        :param graph: CraftingGraph the recipes are taken from
+        """
+        self.graph = graph
+        self.ttl = ttl
+        self.solved = 0
+        self.reused = 0
+        # node: (Plan, time it was solved)
+        self._plans = {}
+
+    def tree(self, node):
+        """
+        :return: the node and every node its recipes use, recursively
+        """
+        seen = set()
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            for recipe in self.graph.recipes(current):
+                stack.extend(resource for resource, _ in self.graph.resources(recipe))
+        return seen
+
+    def _fresh(self, node, now):
+        memo = self._plans.get(node)
+        return memo is not None and now - memo[1] < self.ttl
+
+    async def order(self, item_id, amount):
+        """
+        Cheapest way to craft amount of an item
+        :return: CraftOrder, None if the item has no recipe
+        """
+        node = self.graph.node(item_id)
+        if node is None or not self.graph.craftable(node):
+            return None
+        now = time()
+        stale = [other for other in self.tree(node) if not self._fresh(other, now)]
+        prices = await market_prices(self.graph.ids[other] for other in stale)
+        plan = self._solve(node, prices, now, set())
+        order = CraftOrder(item_id, amount, plan)
+        self._expand(order, plan, amount, craft=True)
+        return order
+
+    def _solve(self, node, prices, now, visiting):
+        if self._fresh(node, now):
+            self.reused += 1
+            return self._plans[node][0]
+        item_id = self.graph.ids[node]
+        price, city = prices.get(item_id) or (math.inf, None)
+        plan = Plan(item_id, price, city)
+        if node in visiting:
+            # A recipe cycle, this ingredient can only be bought.
+            return plan
+        visiting.add(node)
+        for recipe in self.graph.recipes(node):
+            cost = self.graph.silver[recipe] + sum(
+                count * self._solve(resource, prices, now, visiting).cost
+                for resource, count in self.graph.resources(recipe)
+            )
+            cost /= self.graph.amount[recipe]
+            if plan.recipe is None or cost < plan.craft_cost:
+                plan.craft_cost, plan.recipe = cost, recipe
+        visiting.discard(node)
+        self._plans[node] = (plan, now)
+        self.solved += 1
+        return plan
+
+    def _expand(self, order, plan, amount, craft=False):
+        if plan.recipe is not None and (craft or plan.crafted):
+            recipe = plan.recipe
+            crafts = math.ceil(amount / self.graph.amount[recipe])
+            order.crafts[plan.item_id] = order.crafts.get(plan.item_id, 0) + crafts
+            order.silver += self.graph.silver[recipe] * crafts
+            for currency, count in self.graph.currencies(recipe):
+                name = self.graph.ids[currency]
+                order.currency[name] = order.currency.get(name, 0) + count * crafts
+            for resource, count in self.graph.resources(recipe):
+                memo = self._plans.get(resource)
+                self._expand(order, memo[0] if memo is not None else Plan(self.graph.ids[resource]), count * crafts)
+        elif plan.city is None:
+            order.unpriced.add(plan.item_id)
+        else:
+            bought = order.buy.setdefault(plan.item_id, [0, plan.city, plan.buy_price])
+            bought[0] += amount
+
+    @property
+    def stats(self):
+        return {"plans": len(self._plans), "solved": self.solved, "reused": self.reused}
+
+
+async def market_prices(item_ids):
+    """
+    Lowest current sell order of each item (normal quality) and the city it is in.
+    The lookups are made at once so the request batcher merges them into as few requests as possible.
+    :return: {item_id: (price, city)}, items without a sell order are left out
+    """
+    item_ids = list(item_ids)
+    responses = await asyncio.gather(*(get_current_data(item_id) for item_id in item_ids))
+    prices = {}
+    for item_id, rows in zip(item_ids, responses):
+        offers = [
+            (row["sell_price_min"], row["city"])
+            for row in rows or ()
+            if row["sell_price_min"] and row["quality"] <= 1 and row["city"] in BUY_CITIES
+        ]
+        if offers:
+            prices[item_id] = min(offers)
+    return prices
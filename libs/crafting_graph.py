@@ -0,0 +1,149 @@
+import re
+import sys
+from array import array
+
+# Enchanted resources may only be listed as enchantments of their base resource ie. T4_PLANKS_LEVEL1@1 as T4_PLANKS@1.
+ENCHANTED_RESOURCE = re.compile(r"^(.*)_LEVEL(\d)@\2$")
+ARRAYS = (
+    ("recipe_offsets", "I"),
+    ("silver", "q"),
+    ("amount", "I"),
+    ("resource_offsets", "I"),
+    ("resource", "I"),
+    ("resource_count", "I"),
+    ("currency_offsets", "I"),
+    ("currency", "I"),
+    ("currency_count", "I"),
+    ("used_in_offsets", "I"),
+    ("used_in", "I"),
+)
+
+
+class CraftingGraph:
+    """
+    Crafting recipes compiled once into integer indexed arrays. Every item, resource and currency is a node,
+    ranges of the offsets arrays select:
+    - the recipes of a node: recipe_offsets[node]:recipe_offsets[node + 1],
+    - the resources and currencies of a recipe, with their counts in the parallel *_count arrays,
+    - the items made from a node (its resources or currencies): used_in_offsets[node]:used_in_offsets[node + 1].
+    """
+    __slots__ = ("ids", "positions") + tuple(name for name, _ in ARRAYS)
+
+    def __init__(self, ids, **arrays):
+        self.ids = ids
+        self.positions = {item_id: node for node, item_id in enumerate(ids)}
+        for name, _ in ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def build(cls, itemdata):
+        """
+        :param itemdata: crafting recipes by item id, see item_handler.format_crafting_data()
+        """
+        entries = dict(itemdata)
+        for entry in itemdata.values():
+            for recipe in entry["recipes"]:
+                for resource, _ in recipe["resources"]:
+                    match = ENCHANTED_RESOURCE.match(resource)
+                    if resource not in entries and match is not None:
+                        # Moved to the market id recipes use, T4_PLANKS@1 is not an item of its own.
+                        alias = entries.pop(f"{match.group(1)}@{match.group(2)}", None)
+                        if alias is not None:
+                            entries[resource] = alias
+
+        ids = [sys.intern(item_id) for item_id in entries]
+        positions = {item_id: node for node, item_id in enumerate(ids)}
+
+        def node_of(item_id):
+            node = positions.get(item_id)
+            if node is None:
+                node = positions[item_id] = len(ids)
+                ids.append(sys.intern(item_id))
+            return node
+
+        arrays = {name: array(typecode) for name, typecode in ARRAYS}
+        for name in ("recipe_offsets", "resource_offsets", "currency_offsets"):
+            arrays[name].append(0)
+        consumers = {}
+        for node, entry in enumerate(entries.values()):
+            for recipe in entry["recipes"]:
+                arrays["silver"].append(recipe["silver"])
+                arrays["amount"].append(recipe["amount"])
+                for kind, edges in (("resource", recipe["resources"]), ("currency", recipe["currency"])):
+                    for item_id, count in edges:
+                        used = node_of(item_id)
+                        arrays[kind].append(used)
+                        arrays[f"{kind}_count"].append(count)
+                        consumers.setdefault(used, set()).add(node)
+                    arrays[f"{kind}_offsets"].append(len(arrays[kind]))
+            arrays["recipe_offsets"].append(len(arrays["silver"]))
+
+        # Nodes added as resources have no recipes.
+        arrays["recipe_offsets"].extend([len(arrays["silver"])] * (len(ids) + 1 - len(arrays["recipe_offsets"])))
+        arrays["used_in_offsets"].append(0)
+        for node in range(len(ids)):
+            arrays["used_in"].extend(sorted(consumers.get(node, ())))
+            arrays["used_in_offsets"].append(len(arrays["used_in"]))
+        return cls(ids, **arrays)
+
+    def sections(self):
+        """
+        Binary sections of the graph for a crafting snapshot
+        """
+        sections = {"crafting.ids": "\n".join(self.ids).encode("utf-8")}
+        for name, _ in ARRAYS:
+            sections[f"crafting.{name}"] = getattr(self, name)
+        return sections
+
+    @classmethod
+    def from_sections(cls, sections):
+        packed_ids = str(sections["crafting.ids"], "utf-8")
+        ids = [sys.intern(item_id) for item_id in packed_ids.split("\n")] if packed_ids else []
+        return cls(ids, **{name: sections[f"crafting.{name}"] for name, _ in ARRAYS})
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, item_id):
+        return item_id in self.positions
+
+    def node(self, item_id):
+        """
+        :return: index of the item, None if no recipe makes or uses it
+        """
+        return self.positions.get(item_id)
+
+    def recipes(self, node):
+        return range(self.recipe_offsets[node], self.recipe_offsets[node + 1])
+
+    def craftable(self, node):
+        return self.recipe_offsets[node] != self.recipe_offsets[node + 1]
+
+    def resources(self, recipe):
+        """
+        :return: (node, count) of every resource of a recipe
+        """
+        start, end = self.resource_offsets[recipe], self.resource_offsets[recipe + 1]
+        return zip(self.resource[start:end], self.resource_count[start:end])
+
+    def currencies(self, recipe):
+        start, end = self.currency_offsets[recipe], self.currency_offsets[recipe + 1]
+        return zip(self.currency[start:end], self.currency_count[start:end])
+
+    def consumers(self, node):
+        """
+        :return: nodes of the items that have a recipe using this one
+        """
+        return self.used_in[self.used_in_offsets[node]:self.used_in_offsets[node + 1]]
+
+    def count_in(self, node, used):
+        """
+        :return: how many of used the recipes of node take, the fewest if several recipes use it
+        """
+        return min(
+            count
+            for recipe in self.recipes(node)
+            for edges in (self.resources(recipe), self.currencies(recipe))
+            for other, count in edges
+            if other == used
+        )
@@ -4,11 +4,11 @@ from sqlite3 import Error, connect
 log = logging.getLogger(__name__)
 
 
-def create_connection(db_file):
-    """ create a database connection to a SQLite database """
+def create_connection(db_file, **kwargs):
+    """ create a database connection to a SQLite database, kwargs are passed to sqlite3.connect """
     conn = None
     try:
-        conn = connect(db_file)
+        conn = connect(db_file, **kwargs)
         # Set journal mode to WAL.
         conn.execute('pragma journal_mode=wal')
     except Error as e:
@@ -9,6 +9,23 @@ class NoInfoSentToAlbie(Exception):
     Try searching again, if this error persists drop me discord message.
     """
 
+    def __init__(self, ctx):
+        self.embed = Embed(color=0xff0000)
+        self.embed.set_thumbnail(
+            url="http://clipart-library.com/images/kTMK4787c.jpg")
+        self.embed.add_field(name="No Information Sent to Albie Bot",
+                             value="Looks like the Albion-Data Project didn't send anything to Poor Albie Bot,"
+                                   " They might be under heavy load. Try searching again,"
+                                   " if this error persists drop me discord message.",
+                             inline=False)
+        self.ctx = ctx
+        self.loop = asyncio.get_running_loop()
+        self.loop.create_task(self.send_discord_msg())
+
+    async def send_discord_msg(self):
+        self.embed.set_footer(text="💬 Want to help Improve the bot ? Go to: github.com/GraciousGpal/Albie")
+        await self.ctx.send(embed=self.embed)
+
 
 class ItemNotFound(Exception):
     """
@@ -55,3 +72,10 @@ class NoHistoryDataAvailable(Exception):
     async def send_discord_msg(self):
         self.embed.set_footer(text="💬 Want to help Improve the bot ? Go to: github.com/GraciousGpal/Albie")
         await self.ctx.send(embed=self.embed)
+
+
+class UpstreamUnavailable(Exception):
+    """
+    The Albion-Data Project is not answering right now, they might be under heavy load.
+    Raised while the circuit breaker is open or once every retry failed.
+    """
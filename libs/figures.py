@@ -0,0 +1,112 @@
+import io
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import LinearSegmentedColormap, to_rgba_array
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter
+
+from libs.constants import CITY_COLOURS
+from libs.utils import c_game_currency
+
+# Chart style, set on each figure instead of through pyplot's global rc state so renders can run in parallel threads.
+FIGURE_COLOUR = "white"
+BACKGROUND_COLOUR = "black"
+GRID_COLOUR = ".1"
+TEXT_COLOUR = ".65"
+LABEL_COLOUR = ".15"
+LEGEND_EDGE_COLOUR = ".8"
+FONT_SIZE = 12
+TICK_FONT_SIZE = 11
+LINE_WIDTH = 1
+HISTORY_SIZE = (6.4, 4.8)
+HEATMAP_SIZE = (20, 6)
+DPI = 100
+# Dark red to cream, the seaborn "rocket" palette the heatmaps used before.
+HEATMAP_COLOURS = LinearSegmentedColormap.from_list(
+    "albie_heatmap",
+    ["#03051a", "#30173a", "#611f53", "#971c5b", "#cb1b4f", "#ec4c3e", "#f58860", "#f6bc99", "#faebdd"],
+)
+
+
+def render_history_chart(series):
+    """
+    Average price history chart
+    :param series: {city: (timestamps, average prices)}, arrays or lists
+    :return: png bytes
+    """
+    figure = Figure(figsize=HISTORY_SIZE, dpi=DPI, facecolor=FIGURE_COLOUR)
+    ax = figure.add_subplot()
+    _style_axes(ax)
+    ax.set_facecolor(BACKGROUND_COLOUR)
+    ax.grid(True, color=GRID_COLOUR)
+    ax.set_axisbelow(True)
+
+    if len(series) != 0:
+        for city, (timestamps, prices) in series.items():
+            ax.plot(timestamps, prices, color=CITY_COLOURS[city], linewidth=LINE_WIDTH, label=city)
+        ax.set_title("Average Item Price", color=TEXT_COLOUR, fontsize=FONT_SIZE)
+        ax.tick_params(axis="x", labelrotation=20)
+        ax.legend(
+            fontsize=TICK_FONT_SIZE,
+            labelcolor=TEXT_COLOUR,
+            facecolor=BACKGROUND_COLOUR,
+            edgecolor=LEGEND_EDGE_COLOUR,
+        )
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda value, position: c_game_currency(value)))
+    return _png(figure)
+
+
+def render_order_heatmaps(tables):
+    """
+    Sell/buy order heatmaps side by side
+    :param tables: list of (title, values, annotations, row labels, column labels), one heatmap each
+    :return: png bytes
+    """
+    figure = Figure(figsize=HEATMAP_SIZE, dpi=DPI, facecolor=FIGURE_COLOUR)
+    for ax, (title, values, annotations, index, columns) in zip(figure.subplots(1, len(tables), squeeze=False)[0],
+                                                                 tables):
+        values = np.ma.masked_invalid(np.asarray(values, dtype=float))
+        _style_axes(ax)
+        ax.set_facecolor(BACKGROUND_COLOUR)
+        mesh = ax.pcolormesh(values, cmap=HEATMAP_COLOURS, vmin=values.min(), vmax=values.max())
+        ax.set_xlim(0, values.shape[1])
+        ax.set_ylim(values.shape[0], 0)
+        ax.set_xticks(np.arange(values.shape[1]) + 0.5, labels=columns, rotation=30)
+        ax.set_yticks(np.arange(values.shape[0]) + 0.5, labels=index, va="center")
+        ax.set_title(title, color=TEXT_COLOUR, fontsize=FONT_SIZE)
+
+        # Annotations are dark on light cells and white on dark ones.
+        colours = mesh.cmap(mesh.norm(values))
+        for row, column in zip(*np.nonzero(~np.ma.getmaskarray(values))):
+            ax.text(
+                column + 0.5,
+                row + 0.5,
+                annotations[row][column],
+                color=LABEL_COLOUR if _luminance(colours[row, column]) > 0.408 else "w",
+                fontsize=FONT_SIZE,
+                ha="center",
+                va="center",
+            )
+    return _png(figure)
+
+
+def _style_axes(ax):
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    ax.tick_params(length=0, colors=LABEL_COLOUR, labelsize=TICK_FONT_SIZE)
+
+
+def _luminance(colour):
+    """
+    W3C relative luminance of a colour
+    """
+    rgb = to_rgba_array(colour)[0, :3]
+    rgb = np.where(rgb <= 0.03928, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    return rgb.dot([0.2126, 0.7152, 0.0722])
+
+
+def _png(figure):
+    buffer = io.BytesIO()
+    FigureCanvasAgg(figure).print_png(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,128 @@
+import datetime
+import os
+import threading
+
+from libs.db import create_connection
+
+
+class HistoryStore:
+    """
+    Local copy of the albion-data price history, one row per item, location, quality, time scale and timestamp.
+    For every item and time scale it remembers the range it was synced over, so later lookups only request
+    the days since the last sync and the rest is read back from SQLite.
+    Methods block, call them from a worker thread. Until start() opens the db nothing is stored and every
+    lookup goes upstream.
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.full_fetches = 0
+        self.delta_fetches = 0
+        self._lock = threading.Lock()
+        self.conn = None
+
+    def start(self):
+        """
+        Opens the db, created with its directory if missing. Called once the bot starts, not when imported.
+        """
+        if self.conn is not None:
+            return
+        directory = os.path.dirname(self.db_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = create_connection(self.db_file, check_same_thread=False)
+        if self.conn is not None:
+            self.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS history (
+                    item_id TEXT, location TEXT, quality INTEGER, scale INTEGER, timestamp TEXT,
+                    item_count INTEGER, avg_price INTEGER,
+                    PRIMARY KEY (item_id, scale, location, quality, timestamp)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS history_sync (
+                    item_id TEXT, scale INTEGER, since TEXT, until TEXT,
+                    PRIMARY KEY (item_id, scale)
+                );
+                """
+            )
+            self.conn.commit()
+
+    def close(self):
+        if self.conn is not None:
+            with self._lock:
+                self.conn.close()
+                self.conn = None
+
+    def start_date(self, item_id, scale, since):
+        """
+        First day to request from upstream
+        :param since: first day of the wanted history
+        :return: the day of the last sync if the store already covers since, since otherwise
+        """
+        if self.conn is not None:
+            with self._lock:
+                row = self.conn.execute(
+                    "SELECT since, until FROM history_sync WHERE item_id = ? AND scale = ?", (item_id, scale)
+                ).fetchone()
+            if row is not None and row[0] <= since.isoformat() <= row[1]:
+                self.delta_fetches += 1
+                # The last synced day is requested again, its latest buckets may have been incomplete.
+                return datetime.date.fromisoformat(row[1])
+        self.full_fetches += 1
+        return since
+
+    def update(self, item_id, scale, rows, since, until):
+        """
+        Merge rows fetched from upstream and drop points older than since
+        :param rows: albion-data history response, covering start_date() to until
+        :return: the stored history from since on, in the albion-data response format
+        """
+        if self.conn is None:
+            return rows
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO history VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (item_id, row["location"], row["quality"], scale, point["timestamp"],
+                     point["item_count"], point["avg_price"])
+                    for row in rows
+                    for point in row["data"]
+                ),
+            )
+            self.conn.execute(
+                "DELETE FROM history WHERE item_id = ? AND scale = ? AND timestamp < ?",
+                (item_id, scale, since.isoformat()),
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO history_sync VALUES (?, ?, ?, ?)",
+                (item_id, scale, since.isoformat(), until.isoformat()),
+            )
+            self.conn.commit()
+        return self.history(item_id, scale, since)
+
+    def history(self, item_id, scale, since):
+        """
+        Stored history of an item from since on
+        :return: list of {"location", "item_id", "quality", "data": [points]} like the albion-data api
+        """
+        if self.conn is None:
+            return []
+        with self._lock:
+            points = self.conn.execute(
+                "SELECT location, quality, timestamp, item_count, avg_price FROM history "
+                "WHERE item_id = ? AND scale = ? AND timestamp >= ? ORDER BY location, quality, timestamp",
+                (item_id, scale, since.isoformat()),
+            ).fetchall()
+
+        history = []
+        current = None
+        for location, quality, timestamp, item_count, avg_price in points:
+            if current is None or current["location"] != location or current["quality"] != quality:
+                current = {"location": location, "item_id": item_id, "quality": quality, "data": []}
+                history.append(current)
+            current["data"].append({"item_count": item_count, "avg_price": avg_price, "timestamp": timestamp})
+        return history
+
+    @property
+    def stats(self):
+        return {"full_fetches": self.full_fetches, "delta_fetches": self.delta_fetches}
@@ -0,0 +1,66 @@
+import logging
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+log = logging.getLogger(__name__)
+
+try:
+    # aiohttp decodes brotli responses when one of these is installed (aiohttp[speedups]).
+    import brotli  # noqa: F401
+
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+# Connection pool and request limits of the shared client.
+MAX_CONNECTIONS = 100
+MAX_CONNECTIONS_PER_HOST = 20
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 30
+REQUEST_TIMEOUT = ClientTimeout(total=20, connect=5, sock_read=15)
+
+_session = None
+
+
+async def start():
+    """
+    Creates the application wide HTTP client, called once the bot has an event loop.
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = ClientSession(
+            connector=TCPConnector(
+                limit=MAX_CONNECTIONS,
+                limit_per_host=MAX_CONNECTIONS_PER_HOST,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ),
+            timeout=REQUEST_TIMEOUT,
+            headers={
+                "Accept-Encoding": ACCEPT_ENCODING,
+                "User-Agent": "Albie Discord Bot (github.com/GraciousGpal/Albie)",
+            },
+        )
+        log.info(f"HTTP client started (accepting {ACCEPT_ENCODING}).")
+    return _session
+
+
+async def close():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+def get_session():
+    """
+    Get the shared HTTP client, started with the bot.
+    """
+    if _session is None or _session.closed:
+        raise RuntimeError("HTTP client is not started, call libs.http_client.start() first.")
+    return _session
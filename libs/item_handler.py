@@ -1,72 +1,306 @@
 import asyncio
 import datetime
 import logging
+import os
+import re
+import typing
 from time import time
 
-import aiohttp
-
+from libs.batching import RequestBatcher
+from libs.cache import PriceCache
 from libs.constants import BASE_URL_HISTORY, BASE_URL_CURRENT, LOCATIONS
-from libs.search_algorithms import jw_search
-from libs.utils import get_data, download_file_with_fallback
+from libs.crafting_graph import CraftingGraph
+from libs.history_store import HistoryStore
+from libs.item_table import ItemTable
+from libs.search_index import FacetIndex, NameIndex
+from libs.snapshot import file_digest, open_snapshot, snapshot_path, write_snapshot
+from libs.utils import get_data, download_file, ijson, iter_json_array, load_json_file
 
 log = logging.getLogger(__name__)
-session = aiohttp.ClientSession()
+
+# Seconds prices stay fresh in the cache, then how long a stale copy is still served while it is refreshed.
+CURRENT_PRICES_TTL = 120
+CURRENT_PRICES_MAX_STALE = 15 * 60
+HISTORY_TTL = 60 * 60
+HISTORY_MAX_STALE = 12 * 60 * 60
+# Months of price history kept for charts and averages.
+HISTORY_MONTHS = 6
+# Enchanted resources are named ie. T4_PLANKS_LEVEL1.
+LEVEL_SUFFIX = re.compile(r"_LEVEL(\d)$")
+
+# Memory the cached responses may take, as json. A six month history of an item is about a megabyte.
+PRICE_CACHE_MAX_BYTES = 32 * 2 ** 20
+
+# Set ALBIE_PRICE_CACHE_DB (ie. data/price_cache.db) to keep cached prices across restarts.
+price_cache = PriceCache(max_bytes=PRICE_CACHE_MAX_BYTES, db_file=os.environ.get("ALBIE_PRICE_CACHE_DB"))
+# Price history is kept locally, later lookups only fetch the points added since.
+history_store = HistoryStore(os.environ.get("ALBIE_HISTORY_DB", "data/history.db"))
 
 
-def load_optimized_data(data_url):
-    # Get updated versions of item files and returns a trimmed version of the file.
-    data = download_file_with_fallback(data_url, "data/item_data.json")
+async def load_optimized_data(data_url):
+    """
+    Gets the updated item dump and returns it as a compact ItemTable with its facets and search index.
+    They are built once per version of the dump, later starts memory map the snapshot of the processed catalog.
+    """
+    path = await download_file(data_url, "data/item_data.json")
     log.info("Latest Items downloaded.")
-    trimmed_data = {}
-    for item in data:
-        meta = {}
-        try:
-            meta["LocalizedNames"] = item["LocalizedNames"]
-            meta["LocalizedDescriptions"] = item["LocalizedDescriptions"]
-        except KeyError:
-            pass
-
-        if meta["LocalizedNames"] is None:
-            continue
-        meta["UniqueName"] = item["UniqueName"]
+    return await asyncio.to_thread(load_item_catalog, path)
 
-        trimmed_data[item["UniqueName"]] = meta
-    return trimmed_data, data
 
+def load_item_catalog(path):
+    key = file_digest(path)
+    snapshot = snapshot_path("items", key)
+    sections = open_snapshot(snapshot, key)
+    if sections is not None:
+        items = ItemTable.from_sections(sections)
+        return items, tradable_facets(items), NameIndex.from_sections(items.ids, sections)
 
-async def get_current_data(item_name):
+    items, facets, name_index = build_item_catalog(path)
     try:
-        currurl = (
-                BASE_URL_CURRENT
-                + item_name
-                + "?locations="
-                + f"{LOCATIONS[0]}"
-                + "".join(["," + "".join(x) for x in LOCATIONS if x != LOCATIONS[0]])
-        )
-        return await get_data(currurl)
-    except Exception as e:
-        log.error(e)
-        return None
+        write_snapshot(snapshot, key, {**items.sections(), **name_index.sections()})
+    except OSError as e:
+        log.warning(f"Could not write item snapshot: {e!r}")
+    return items, facets, name_index
+
+
+def build_item_catalog(path):
+    """
+    Builds the catalog from the dump, streamed item by item so only the fields kept are ever in memory at once.
+    """
+    items = ItemTable.from_dump(iter_json_array(path))
+    facets = tradable_facets(items)
+    return items, facets, NameIndex.build(items, facets.ids)
+
+
+def tradable_facets(items):
+    return FacetIndex(item_id for item_id in items.ids if "NONTRADABLE" not in item_id)
+
+
+async def load_crafting_data(data_url) -> CraftingGraph:
+    """
+    Download the crafting data and compile its recipes into a CraftingGraph
+    """
+    path = await download_file(data_url, "data/items_crafting.json")
+    graph = await asyncio.to_thread(load_crafting_catalog, path)
+    log.info("Item crafting data downloaded")
+    return graph
+
 
+def load_crafting_catalog(path) -> CraftingGraph:
+    key = file_digest(path)
+    snapshot = snapshot_path("crafting", key)
+    sections = open_snapshot(snapshot, key)
+    if sections is not None:
+        return CraftingGraph.from_sections(sections)
 
-async def get_history_data(item_name, scale=6):
-    date_months_ago = (
-            datetime.date.today() - datetime.timedelta(6 * 365 / 12)
-    ).strftime("%m-%d-%Y")
-    todays_date = datetime.date.today().strftime("%m-%d-%Y")
+    graph = CraftingGraph.build(format_crafting_data(crafting_entries(path)))
     try:
-        full_hisurl = (
-                BASE_URL_HISTORY
-                + item_name
-                + f"?date={date_months_ago}&end_date={todays_date}&locations="
-                + f"{LOCATIONS[0]}"
-                + "".join(["," + "".join(x) for x in LOCATIONS if x != LOCATIONS[0]])
-                + f"&time-scale={scale}"
-        )
-        return await get_data(full_hisurl)
-    except Exception as e:
-        log.error(e)
-        return None
+        write_snapshot(snapshot, key, graph.sections())
+    except OSError as e:
+        log.warning(f"Could not write crafting snapshot: {e!r}")
+    return graph
+
+
+def crafting_entries(path):
+    """
+    Yields (category, item, listed) for every item of the crafting dump, listed is False for categories
+    holding a single item. Streamed one item at a time when ijson is installed.
+    """
+    if ijson is None:
+        for category, content in load_json_file(path)["items"].items():
+            if isinstance(content, list):
+                for item in content:
+                    yield category, item, True
+            elif isinstance(content, dict):
+                yield category, content, False
+        return
+
+    with open(path, "rb") as fp:
+        category = None
+        item_prefix = None
+        builder = None
+        for prefix, event, value in ijson.parse(fp, use_float=True):
+            if item_prefix is None:
+                if prefix == "items" and event == "map_key":
+                    category = value
+                elif event == "start_map" and prefix in (f"items.{category}", f"items.{category}.item"):
+                    item_prefix = prefix
+                    builder = ijson.ObjectBuilder()
+                    builder.event(event, value)
+            else:
+                builder.event(event, value)
+                if prefix == item_prefix and event == "end_map":
+                    yield category, builder.value, prefix.endswith(".item")
+                    item_prefix = None
+
+
+def format_crafting_data(entries) -> typing.Dict:
+    """
+    Crafting recipes of every craftable item, keyed by the item id albion-data uses (enchanted items get their own
+    entry ie. T4_HEAD_LEATHER_SET3@1):
+    {"tier": "4", "recipes": [{"silver": 0, "amount": 1, "resources": [[item_id, count]], "currency": [[name, count]]}]}
+    where amount is how many items one craft makes. "value" is kept for items that have one.
+    :param entries: (category, item, listed) of every item of the crafting dump, see crafting_entries()
+    """
+    itemdata = {}
+    for category, item, listed in entries:
+        if category in (
+                "shopcategories",
+                "@xmlns:xsi",
+                "@xsi:noNamespaceSchemaLocation",
+        ):
+            continue
+        recipes = crafting_recipes(item.get("craftingrequirements"))
+        if recipes:
+            itemdata[market_id(item["@uniquename"], item.get("@enchantmentlevel"))] = crafting_entry(item, recipes)
+        for enchantment in as_list((item.get("enchantments") or {}).get("enchantment")):
+            recipes = crafting_recipes(enchantment.get("craftingrequirements"))
+            if recipes:
+                itemdata[market_id(item["@uniquename"], enchantment["@enchantmentlevel"])] = crafting_entry(
+                    item, recipes
+                )
+    return itemdata
+
+
+def crafting_entry(item, recipes):
+    entry = {"tier": item["@tier"], "recipes": recipes}
+    if "@itemvalue" in item:
+        entry["value"] = item["@itemvalue"]
+    return entry
+
+
+def crafting_recipes(requirements):
+    """
+    :param requirements: craftingrequirements of an item, one recipe or a list of alternatives
+    """
+    recipes = []
+    for requirement in as_list(requirements):
+        resources = [
+            [market_id(resource["@uniquename"], resource.get("@enchantmentlevel")), int(resource["@count"])]
+            for resource in as_list(requirement.get("craftresource"))
+        ]
+        currency = [
+            [currency["@uniquename"], int(currency["@amount"])] for currency in as_list(requirement.get("currency"))
+        ]
+        if resources or currency:
+            recipes.append({
+                "silver": int(requirement.get("@silver", 0)),
+                "amount": int(requirement.get("@amountcrafted", 1)),
+                "resources": resources,
+                "currency": currency,
+            })
+    return recipes
+
+
+def market_id(unique_name, enchantment=None):
+    """
+    Item id albion-data uses: enchanted items carry their level after an @ ie. T4_LEATHER_LEVEL1@1.
+    Resources without an enchantment level get it from their _LEVEL suffix.
+    """
+    if enchantment is None:
+        match = LEVEL_SUFFIX.search(unique_name)
+        enchantment = match.group(1) if match else 0
+    return f"{unique_name}@{enchantment}" if int(enchantment) and "@" not in unique_name else unique_name
+
+
+def as_list(value):
+    """
+    The dumps hold a dict where there is one element and a list where there are more
+    """
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+async def get_current_data(item_name):
+    """
+    Current prices of an item in every location, served from the price cache when recent enough
+    """
+    return await price_cache.get(
+        current_data_key(item_name),
+        lambda: fetch_current_data(item_name),
+        CURRENT_PRICES_TTL,
+        CURRENT_PRICES_MAX_STALE,
+    )
+
+
+def current_data_key(item_name):
+    return "current", item_name, ",".join(LOCATIONS)
+
+
+def current_data_url(item_names, group=()):
+    return (
+            BASE_URL_CURRENT
+            + ",".join(item_names)
+            + "?locations="
+            + f"{LOCATIONS[0]}"
+            + "".join(["," + "".join(x) for x in LOCATIONS if x != LOCATIONS[0]])
+    )
+
+
+async def fetch_current_data(item_name):
+    return await current_batcher.get(item_name)
+
+
+async def get_history_data(item_name, scale=6, months=HISTORY_MONTHS):
+    """
+    Price history of an item in every location, served from the price cache when recent enough
+    :param scale: hours per data point
+    :param months: how far back the history goes
+    """
+    return await price_cache.get(
+        history_data_key(item_name, scale, months),
+        lambda: fetch_history_data(item_name, scale, months),
+        HISTORY_TTL,
+        HISTORY_MAX_STALE,
+    )
+
+
+def history_data_key(item_name, scale=6, months=HISTORY_MONTHS):
+    return "history", item_name, ",".join(LOCATIONS), scale, months
+
+
+def history_data_url(item_names, group):
+    date_months_ago, todays_date, scale = group
+    return (
+            BASE_URL_HISTORY
+            + ",".join(item_names)
+            + f"?date={date_months_ago}&end_date={todays_date}&locations="
+            + f"{LOCATIONS[0]}"
+            + "".join(["," + "".join(x) for x in LOCATIONS if x != LOCATIONS[0]])
+            + f"&time-scale={scale}"
+    )
+
+
+async def fetch_history_data(item_name, scale=6, months=HISTORY_MONTHS):
+    """
+    Fetches the days missing from the local history store and returns the merged history,
+    the stored copy if the upstream request failed.
+    """
+    today = datetime.date.today()
+    since = today - datetime.timedelta(months * 365 / 12)
+    start = await asyncio.to_thread(history_store.start_date, item_name, scale, since)
+    rows = await history_batcher.get(
+        item_name, (start.strftime("%m-%d-%Y"), today.strftime("%m-%d-%Y"), scale)
+    )
+    if rows is None:
+        return await asyncio.to_thread(history_store.history, item_name, scale, since) or None
+    return await asyncio.to_thread(history_store.update, item_name, scale, rows, since, today)
+
+
+def price_lookups(item_name):
+    """
+    (cache key, fetch, ttl) of every response a price lookup of the item reads from the price cache
+    """
+    return [
+        (current_data_key(item_name), lambda: fetch_current_data(item_name), CURRENT_PRICES_TTL),
+        (history_data_key(item_name), lambda: fetch_history_data(item_name), HISTORY_TTL),
+    ]
+
+
+# Items requested at about the same time (ie. every ingredient of a craft) are fetched with one request.
+current_batcher = RequestBatcher(current_data_url, get_data)
+history_batcher = RequestBatcher(history_data_url, get_data)
 
 
 class Item:
@@ -84,16 +318,21 @@ class Item:
         self.enchant = None
         self.tier = None
 
-    def get_matches(self):
+    async def get_matches(self):
+        """
+        Runs the item search on a worker thread, the compiled scorer releases the GIL while ranking
+        so the event loop keeps running.
+        """
+        await asyncio.to_thread(self.find_matches)
+
+    def find_matches(self):
         start_t = time()
-        results = jw_search(
-            self.item_w, self.cog_self.item_id_score.copy(), self.cog_self.language_list
-        )
-        if results["suggestions"][0][0] is None:
+        results = self.cog_self.catalog.search(self.item_w)
+        if not results["suggestions"] or results["suggestions"][0][0] is None:
             return
         self.matched = results["suggestions"][0][0]
         self.name = (
-            self.cog_self.op_dict[self.matched]["LocalizedNames"]["EN-US"]
+            self.cog_self.catalog.name(self.matched)
             if self.matched is not None
             else None
         )
@@ -106,16 +345,12 @@ class Item:
         self.match_time = time() - start_t
 
     async def get_data(self):
-        self.current_prices, self.price_history = await asyncio.gather(
-            get_current_data(self.matched), get_history_data(self.matched)
-        )
+        await asyncio.gather(self.get_current_prices(), self.get_price_history())
 
+    async def get_current_prices(self):
+        self.current_prices = await get_current_data(self.matched)
+        return self.current_prices
 
-def load_language_list_ls(item_dictionary):
-    items_in_all_lang = []
-    for item_v2 in item_dictionary:
-        for language in item_dictionary[item_v2]["LocalizedNames"]:
-            items_in_all_lang.append(
-                [item_dictionary[item_v2]["LocalizedNames"][language].upper(), item_v2]
-            )
-    return items_in_all_lang
+    async def get_price_history(self):
+        self.price_history = await get_history_data(self.matched)
+        return self.price_history
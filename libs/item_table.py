@@ -0,0 +1,152 @@
+import sys
+from array import array
+
+
+class PackedStrings:
+    """
+    Read only list of strings stored as one UTF-8 blob and an offsets array.
+    Both can be plain bytes/array or memoryviews over a memory mapped snapshot.
+    """
+    __slots__ = ("blob", "offsets")
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        offsets = array("I", [0])
+        encoded = []
+        for string in strings:
+            data = string.encode("utf-8")
+            encoded.append(data)
+            offsets.append(offsets[-1] + len(data))
+        return cls(b"".join(encoded), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return str(self.blob[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+class ItemRecord:
+    """
+    Light view of one item of an ItemTable, nothing is copied out of the table.
+    """
+    __slots__ = ("table", "index")
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    @property
+    def unique_name(self):
+        return self.table.ids[self.index]
+
+    def name(self, language="EN-US"):
+        return self.table.localized_name(self.index, language)
+
+    @property
+    def names(self):
+        return {
+            language: name
+            for language in self.table.languages
+            if (name := self.table.localized_name(self.index, language))
+        }
+
+
+class ItemTable:
+    """
+    Compact item catalog: interned ids and one PackedStrings column of names per language.
+    Descriptions are never used by the bot and are not kept.
+    """
+    __slots__ = ("ids", "positions", "languages", "names")
+
+    def __init__(self, ids, names):
+        self.ids = ids
+        self.positions = {item_id: index for index, item_id in enumerate(ids)}
+        self.languages = tuple(names)
+        self.names = names
+
+    @classmethod
+    def from_dump(cls, data):
+        """
+        Build the table from the formatted items.json dump, items without localized names are skipped.
+        """
+        ids = []
+        columns = {}
+        for item in data:
+            localized = item.get("LocalizedNames")
+            if localized is None:
+                continue
+            index = len(ids)
+            ids.append(sys.intern(item["UniqueName"]))
+            for language, name in localized.items():
+                column = columns.get(language)
+                if column is None:
+                    column = columns[language] = [""] * index
+                column.append(name or "")
+            for column in columns.values():
+                if len(column) == index:
+                    column.append("")
+
+        return cls(ids, {language: PackedStrings.from_strings(column) for language, column in columns.items()})
+
+    def sections(self):
+        """
+        Binary sections of the table for a catalog snapshot
+        """
+        sections = {"items.ids": "\n".join(self.ids).encode("utf-8")}
+        for language, column in self.names.items():
+            sections[f"items.names.{language}.blob"] = column.blob
+            sections[f"items.names.{language}.offsets"] = column.offsets
+        return sections
+
+    @classmethod
+    def from_sections(cls, sections):
+        packed_ids = str(sections["items.ids"], "utf-8")
+        ids = [sys.intern(item_id) for item_id in packed_ids.split("\n")] if packed_ids else []
+        names = {}
+        for name in sections:
+            if name.startswith("items.names.") and name.endswith(".blob"):
+                language = name[len("items.names."):-len(".blob")]
+                names[language] = PackedStrings(sections[name], sections[f"items.names.{language}.offsets"])
+        return cls(ids, names)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, item_id):
+        return item_id in self.positions
+
+    def __getitem__(self, item_id):
+        return ItemRecord(self, self.positions[item_id])
+
+    def localized_name(self, index, language="EN-US"):
+        column = self.names.get(language)
+        if column is None:
+            return ""
+        return column[index]
+
+    def name(self, item_id, language="EN-US"):
+        """
+        Get the localized name of an item, the id itself if it has no name in that language or is not in the dump
+        """
+        index = self.positions.get(item_id)
+        if index is None:
+            return item_id
+        return self.localized_name(index, language) or item_id
+
+    def language_list(self):
+        """
+        Yields (upper case name, id) for every localized name, what the search index is built from.
+        """
+        for column in self.names.values():
+            for item_id, name in zip(self.ids, column):
+                if name:
+                    yield name.upper(), item_id
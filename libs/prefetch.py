@@ -0,0 +1,155 @@
+import asyncio
+import heapq
+import logging
+import math
+import os
+from time import monotonic
+
+from libs.item_handler import current_batcher, history_batcher, price_cache, price_lookups
+from libs.upstream import breaker
+
+log = logging.getLogger(__name__)
+
+# Seconds after which an item's request count is worth half.
+POPULARITY_HALF_LIFE = 6 * 60 * 60
+POPULARITY_MAXSIZE = 20000
+# Most popular items kept warm, and the upstream requests a prefetch round may spend (0 turns prefetching off).
+PREFETCH_TOP = int(os.environ.get("ALBIE_PREFETCH_TOP", 50))
+PREFETCH_BUDGET = int(os.environ.get("ALBIE_PREFETCH_BUDGET", 10))
+# Seconds between prefetch rounds, and the part of its ttl after which an entry is refreshed ahead of expiry.
+# A round must come before the entry expires: PREFETCH_INTERVAL < CURRENT_PRICES_TTL * (1 - REFRESH_AHEAD).
+PREFETCH_INTERVAL = 20
+REFRESH_AHEAD = 0.75
+
+
+class Popularity:
+    """
+    Request counts per item that decay exponentially, a request half_life seconds ago counts half as much as one now.
+    """
+
+    def __init__(self, half_life=POPULARITY_HALF_LIFE, maxsize=POPULARITY_MAXSIZE):
+        self.half_life = half_life
+        self.maxsize = maxsize
+        self._rate = math.log(2) / half_life
+        self._start = monotonic()
+        # Scores are kept scaled to _start, recording is one addition and older requests need no update.
+        self._scores = {}
+
+    def __len__(self):
+        return len(self._scores)
+
+    def _growth(self):
+        return math.exp(self._rate * (monotonic() - self._start))
+
+    def record(self, item_id):
+        growth = self._growth()
+        if growth > 1e100:
+            self._rescale(growth)
+            growth = 1.0
+        self._scores[item_id] = self._scores.get(item_id, 0.0) + growth
+        if len(self._scores) > self.maxsize:
+            # Forget the least requested half.
+            keep = heapq.nlargest(self.maxsize // 2, self._scores.items(), key=lambda entry: entry[1])
+            self._scores = dict(keep)
+
+    def _rescale(self, growth):
+        self._scores = {item_id: score / growth for item_id, score in self._scores.items()}
+        self._start = monotonic()
+
+    def score(self, item_id):
+        return self._scores.get(item_id, 0.0) / self._growth()
+
+    def top(self, n):
+        """
+        :return: [(item_id, decayed count)] of the n most requested items, most requested first
+        """
+        growth = self._growth()
+        return [
+            (item_id, score / growth)
+            for item_id, score in heapq.nlargest(n, self._scores.items(), key=lambda entry: entry[1])
+        ]
+
+
+def upstream_requests_sent():
+    return current_batcher.requests + history_batcher.requests
+
+
+class Prefetcher:
+    """
+    Keeps the prices of the most requested items in the price cache: every round, the cached responses of the
+    top items that are missing or close to expiring are refreshed, so lookups of popular items do not wait on
+    albion-data. A round spends at most budget upstream requests, rounds are skipped while the circuit is open.
+    """
+
+    def __init__(self, popularity, top=PREFETCH_TOP, budget=PREFETCH_BUDGET, interval=PREFETCH_INTERVAL,
+                 ahead=REFRESH_AHEAD):
+        self.popularity = popularity
+        self.top = top
+        self.budget = budget
+        self.interval = interval
+        self.ahead = ahead
+        self.rounds = 0
+        self.refreshed = 0
+        self.spent = 0
+        self.deferred = 0
+        self._task = None
+
+    def start(self):
+        if self._task is None and self.budget > 0:
+            self._task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.prefetch()
+            except Exception as e:
+                log.error(f"Prefetch failed: {e!r}")
+
+    async def due(self):
+        """
+        :return: [(cache key, fetch)] of the top items' responses to refresh, most popular first
+        """
+        due = []
+        for item_id, _ in self.popularity.top(self.top):
+            for key, fetch, ttl in price_lookups(item_id):
+                age = await price_cache.age(key)
+                if age is None or age >= ttl * self.ahead:
+                    due.append((key, fetch))
+        return due
+
+    async def prefetch(self):
+        """
+        One round of refreshes. They are sent in chunks no bigger than the budget left, all of a chunk at once so
+        the request batchers merge them, and each chunk is charged the upstream requests sent while it ran.
+        :return: upstream requests spent
+        """
+        if breaker.state != "closed":
+            return 0
+        self.rounds += 1
+        due = await self.due()
+        spent = 0
+        while due and spent < self.budget:
+            chunk, due = due[:self.budget - spent], due[self.budget - spent:]
+            before = upstream_requests_sent()
+            await asyncio.gather(*(price_cache.reload(key, fetch) for key, fetch in chunk))
+            spent += upstream_requests_sent() - before
+            self.refreshed += len(chunk)
+        self.spent += spent
+        self.deferred += len(due)
+        return spent
+
+    @property
+    def stats(self):
+        return {
+            "tracked": len(self.popularity),
+            "rounds": self.rounds,
+            "refreshed": self.refreshed,
+            "spent": self.spent,
+            "deferred": self.deferred,
+        }
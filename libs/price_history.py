@@ -0,0 +1,127 @@
+import numpy as np
+
+# Points outside these quantiles of a location's prices are left out, locations with fewer points are left out.
+LOW_QUANTILE = 0.1
+HIGH_QUANTILE = 0.9
+MIN_POINTS = 10
+
+
+class PriceHistory:
+    """
+    Columnar price history of one item: every data point of every location in flat arrays,
+    grouped by location and sorted by timestamp within a location.
+    """
+    __slots__ = ("locations", "location", "timestamp", "avg_price", "item_count")
+
+    def __init__(self, locations, location, timestamp, avg_price, item_count):
+        """
+        :param locations: location names, in the order they appeared in the response
+        :param location: index into locations of each point
+        :param timestamp: datetime64[s] of each point
+        :param avg_price: float average price of each point
+        :param item_count: int items sold in each point
+        """
+        self.locations = locations
+        self.location = location
+        self.timestamp = timestamp
+        self.avg_price = avg_price
+        self.item_count = item_count
+
+    @classmethod
+    def from_response(cls, history_data):
+        """
+        Decodes an albion-data history response, None if there is none.
+        A location listed more than once (one entry per quality) keeps its last entry, locations without points
+        are left out.
+        """
+        entries = {}
+        for entry in history_data or ():
+            entries[entry["location"]] = entry["data"]
+        entries = {location: data for location, data in entries.items() if data}
+        locations = list(entries)
+        points = [point for data in entries.values() for point in data]
+
+        location = np.repeat(np.arange(len(locations)), [len(data) for data in entries.values()])
+        timestamp = np.array([point["timestamp"] for point in points], dtype="datetime64").astype("datetime64[s]")
+        avg_price = np.array([point["avg_price"] for point in points], dtype=float)
+        item_count = np.array([point["item_count"] for point in points], dtype=np.int64)
+        order = np.lexsort((timestamp, location))
+        return cls(locations, location[order], timestamp[order], avg_price[order], item_count[order])
+
+    def __len__(self):
+        return len(self.location)
+
+    def counts(self):
+        return np.bincount(self.location, minlength=len(self.locations))
+
+    def take(self, mask):
+        """
+        History of the points where mask is True, locations left without points are dropped
+        """
+        kept = np.unique(self.location[mask])
+        renumber = np.zeros(len(self.locations), dtype=np.intp)
+        renumber[kept] = np.arange(len(kept))
+        return PriceHistory(
+            [self.locations[index] for index in kept],
+            renumber[self.location[mask]],
+            self.timestamp[mask],
+            self.avg_price[mask],
+            self.item_count[mask],
+        )
+
+    def filtered(self, low=LOW_QUANTILE, high=HIGH_QUANTILE, min_points=MIN_POINTS):
+        """
+        Drops locations with fewer than min_points points and, in the others, points priced outside the
+        low-high quantiles of that location. All quantiles are interpolated at once from one sort.
+        If no location has enough points everything is kept.
+        """
+        counts = self.counts()
+        enough = counts >= min_points
+        if not enough.any():
+            return self
+
+        prices = self.avg_price[np.lexsort((self.avg_price, self.location))]
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        bounds = []
+        for quantile in (low, high):
+            # Linear interpolation between the closest ranks, like numpy and pandas quantile().
+            position = quantile * np.maximum(counts - 1, 0)
+            below = np.floor(position).astype(np.intp)
+            above = np.minimum(below + 1, np.maximum(counts - 1, 0))
+            lower = prices[np.minimum(starts + below, len(prices) - 1)]
+            upper = prices[np.minimum(starts + above, len(prices) - 1)]
+            bounds.append(lower + (upper - lower) * (position - below))
+
+        keep = (
+                enough[self.location]
+                & (self.avg_price >= bounds[0][self.location])
+                & (self.avg_price <= bounds[1][self.location])
+        )
+        return self.take(keep)
+
+    def cities(self):
+        """
+        Yields (location, timestamps, average prices) for every location
+        """
+        ends = np.cumsum(self.counts())
+        start = 0
+        for location, end in zip(self.locations, ends):
+            yield location, self.timestamp[start:end], self.avg_price[start:end]
+            start = end
+
+    def stats(self):
+        """
+        :return: average of the locations' mean prices, average of their mean sell volumes,
+        (location with the highest mean sell volume, its volume), (None, 0) without data
+        """
+        if len(self) == 0:
+            return 0, 0, (None, 0)
+        counts = self.counts()
+        mean_prices = (np.bincount(self.location, self.avg_price) / counts).astype(np.int64)
+        mean_volumes = (np.bincount(self.location, self.item_count) / counts).astype(np.int64)
+        best = int(np.argmax(mean_volumes))
+        return (
+            int(mean_prices.mean()),
+            int(mean_volumes.mean()),
+            (self.locations[best], int(mean_volumes[best])),
+        )
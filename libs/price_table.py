@@ -0,0 +1,133 @@
+import datetime
+
+import numpy as np
+
+from libs.constants import CITY_COLOURS, QUALITY_TIERS
+from libs.utils import c_game_currency
+
+CITIES = list(CITY_COLOURS)
+CITY_COLUMNS = {city: column for column, city in enumerate(CITIES)}
+# Date albion-data sends for prices it has never seen.
+NEVER = np.datetime64("0001-01-01T00:00:00", "s")
+# Units of the "last updated" labels, largest first. Minutes are shown as "m" like months.
+PERIODS = (
+    ("y", 60 * 60 * 24 * 365),
+    ("m", 60 * 60 * 24 * 30),
+    ("d", 60 * 60 * 24),
+    ("h", 60 * 60),
+    ("m", 60),
+    ("s", 1),
+)
+
+
+class OrderTable:
+    """
+    Lowest prices of one order type, one row per quality and one column per city.
+    Qualities and cities without any price are left out.
+    """
+    __slots__ = ("values", "annotations", "updated", "dates", "qualities", "cities")
+
+    def __init__(self, values, annotations, updated, dates, qualities, cities):
+        """
+        :param values: 2d float array of prices, nan where there is none
+        :param annotations: heatmap labels, price and age of each cell
+        :param updated: age of each price ie. "1d 5h ", "" if unknown
+        :param dates: datetime64[s] array of when each price was seen, NaT if unknown
+        :param qualities: row labels
+        :param cities: column labels
+        """
+        self.values = values
+        self.annotations = annotations
+        self.updated = updated
+        self.dates = dates
+        self.qualities = qualities
+        self.cities = cities
+
+    @property
+    def empty(self):
+        return self.values.size == 0
+
+    @classmethod
+    def build(cls, prices, dates, now):
+        """
+        :param prices: (qualities, cities) float array, nan where there is no price
+        :param dates: (qualities, cities) datetime64[s] array of when each price was seen
+        :param now: datetime64[s] the ages are measured from
+        """
+        present = ~np.isnan(prices)
+        rows = present.any(axis=1)
+        columns = present.any(axis=0)
+        values = prices[rows][:, columns]
+        dates = dates[rows][:, columns]
+        ages = last_updated(dates, now)
+
+        annotations = [[""] * values.shape[1] for _ in range(values.shape[0])]
+        for row, column in zip(*np.nonzero(present[rows][:, columns])):
+            age = ages[row][column]
+            annotations[row][column] = c_game_currency(float(values[row, column])) + (f"\n{age}" if age else "")
+        return cls(
+            values,
+            annotations,
+            ages,
+            dates,
+            [quality for quality, keep in zip(QUALITY_TIERS, rows) if keep],
+            [city for city, keep in zip(CITIES, columns) if keep],
+        )
+
+
+def price_tables(current_prices, now=None):
+    """
+    Builds the sell and buy order tables of an albion-data prices response in one pass, the response is not modified
+    :param current_prices: list of price rows (city, quality, sell/buy_price_min and their dates), None if there are none
+    :param now: datetime64[s], defaults to the current local time like the dates shown before
+    :return: sell OrderTable, buy OrderTable
+    """
+    if now is None:
+        now = np.datetime64(datetime.datetime.today(), "s")
+    rows = [
+        row for row in current_prices or ()
+        if row["city"] in CITY_COLUMNS and 0 < row["quality"] <= len(QUALITY_TIERS)
+    ]
+    qualities = np.array([row["quality"] - 1 for row in rows], dtype=np.intp)
+    columns = np.array([CITY_COLUMNS[row["city"]] for row in rows], dtype=np.intp)
+
+    tables = []
+    for order in ("sell", "buy"):
+        prices = np.full((len(QUALITY_TIERS), len(CITIES)), np.nan)
+        dates = np.full(prices.shape, np.datetime64("NaT"), dtype="datetime64[s]")
+        if rows:
+            row_prices = np.array([row[f"{order}_price_min"] for row in rows], dtype=float)
+            row_prices[row_prices == 0] = np.nan
+            row_dates = np.array([row[f"{order}_price_min_date"] for row in rows], dtype="datetime64").astype(
+                "datetime64[s]"
+            )
+            row_dates[row_dates == NEVER] = np.datetime64("NaT")
+            prices[qualities, columns] = row_prices
+            dates[qualities, columns] = row_dates
+        tables.append(OrderTable.build(prices, dates, now))
+    return tables[0], tables[1]
+
+
+def last_updated(dates, now):
+    """
+    How long ago each date was, as its two largest units ie. "1d 5h ".
+    Unknown or future dates and single unit ages other than seconds give "".
+    :param dates: datetime64[s] array
+    :param now: datetime64[s]
+    :return: nested list of strings shaped like dates
+    """
+    known = ~np.isnat(dates)
+    seconds = np.where(known, (now - np.where(known, dates, now)).astype(np.int64), 0)
+    units = np.zeros(dates.shape + (len(PERIODS),), dtype=np.int64)
+    for index, (_, period) in enumerate(PERIODS):
+        over = seconds > period
+        units[..., index] = np.where(over, seconds // period, 0)
+        seconds = np.where(over, seconds % period, seconds)
+
+    ages = [[""] * dates.shape[1] for _ in range(dates.shape[0])]
+    for row, column in zip(*np.nonzero(units.any(axis=-1))):
+        cell = units[row, column]
+        parts = np.nonzero(cell)[0][:2]
+        if len(parts) == 2 or parts[0] == len(PERIODS) - 1:
+            ages[row][column] = "".join(f"{cell[part]}{PERIODS[part][0]} " for part in parts)
+    return ages
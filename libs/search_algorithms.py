@@ -1,24 +1,18 @@
+import heapq
 import logging
-import os
-import sys
+
+from libs.search_index import normalize_name
 
 log = logging.getLogger(__name__)
 
-# This section of the code ensures that the cython module is automatically compiled on the platform it is deployed on.
+# The cython module is built ahead of time (python libs/compiled_libs/setup.py build_ext --inplace),
+# the pure python version of the same functions is used when it is missing.
 try:
-    from libs.compiled_libs.search_algo import simple_distance_algorithm
-except ModuleNotFoundError:
-    version = sys.version_info
-    try:
-        cmd = f"cd libs//compiled_libs && python{version.major}.{version.minor} setup.py build_ext --inplace"
-        stream = os.popen(cmd)
-        output = stream.read()
-        if output == "":
-            raise Exception(f'Python Version {version.major}.{version.minor} not found')
-    except Exception:
-        stream = os.popen("cd libs//compiled_libs// && python setup.py build_ext --inplace")
-        output = stream.read()
-        log.warning(output)
+    from libs.compiled_libs.search_algo import batch_distance_nogil
+except ImportError:
+    log.warning("Compiled search module not found, falling back to the slower pure python search. "
+                "Build it with: python libs/compiled_libs/setup.py build_ext --inplace")
+    from libs.compiled_libs.search_algo_fallback import batch_distance_nogil
 
 
 def get_tier(string):
@@ -72,26 +66,32 @@ def strip_enchant(item_id: str):
     return item_id
 
 
-def get_suggestions(initial_list):
-    suggestions = []
-    cleared = []
+def get_suggestions(initial_list, limit=6):
+    """
+    Get the best scored ids, keeping only the best enchant of each item.
+    Selects the top results directly instead of sorting the whole list.
+    """
+    best = {}
     for s_item in initial_list:
-        if strip_enchant(s_item[0]) not in cleared:
-            suggestions.append(s_item)
-        cleared.append(strip_enchant(s_item[0]))
-        if len(suggestions) > 5:
-            break
-    return suggestions
+        stripped = strip_enchant(s_item[0])
+        if stripped not in best or s_item[1] > best[stripped][1]:
+            best[stripped] = s_item
+    return heapq.nlargest(limit, best.values(), key=lambda tup: tup[1])
 
 
-def jw_search(name: str, item_score, language_list):
+def jw_search(name: str, facets, name_index, cache=None, generation=None):
+    """
+    :param cache: LRUCache of results, optional
+    :param generation: generation of the cache read before facets and name_index were taken, results are
+    only cached if it was not cleared since (defaults to its current generation)
+    """
     found_list = []
     name = name.upper()
 
-    item_keys = item_score.keys()
+    allowed = None
 
     # ID CHECK
-    if name in item_score:
+    if name in facets:
         tier, enchant = feature_extraction(name)
         return {"suggestions": [(name, 100)], "tier": tier, "enchant": enchant}
 
@@ -100,22 +100,33 @@ def jw_search(name: str, item_score, language_list):
 
     # Preprocessing the search varibles and filtering.
     if tier is not None:
-        item_keys = [key for key in item_score if f"T{tier[0]}" in key]
         name = name.replace(f"T{tier[0]}", "")
         name = name.replace(f"t{tier[0]}", "")
     if enchant is not None:
-        item_keys = [key for key in item_keys if f"@{enchant}" in key]
         name = name.replace(f".{enchant} ", "")
-    name = name if name[0] != " " else name[1:]
 
-    # Searching through all language versions and scoring
-    for item_languages in language_list:
-        if item_languages[1] not in item_keys:
-            continue
-        score = simple_distance_algorithm(name, item_languages[0])
+    # Same normalized name, tier and enchant always give the same results.
+    query = normalize_name(name)
+    key = (query, tier[0] if tier is not None else None, enchant)
+    if cache is not None:
+        if generation is None:
+            generation = cache.generation
+        results = cache.get(key)
+        if results is not None:
+            return results
+
+    if tier is not None or enchant is not None:
+        allowed = facets.lookup(key[1], enchant)
+
+    # Only the names sharing enough trigrams with the query get scored, all in one batch.
+    candidates = name_index.candidates(query, allowed)
+    scores = batch_distance_nogil(name, [name_index.names[entry] for entry in candidates])
+    for entry, score in zip(candidates, scores):
         if score != 0:
-            found_list.append((item_languages[1], score))
+            found_list.append((name_index.item_id(entry), score))
 
-    found_list = sorted(found_list, key=lambda tup: tup[1], reverse=True)
     suggestions = get_suggestions(found_list)
-    return {"suggestions": suggestions, "tier": tier, "enchant": enchant}
+    results = {"suggestions": suggestions, "tier": tier, "enchant": enchant}
+    if cache is not None:
+        cache.put(key, results, generation)
+    return results
@@ -0,0 +1,206 @@
+import re
+from array import array
+from collections import defaultdict
+
+from libs.item_table import PackedStrings
+
+# Mirrors full_process_v(force_ascii=True) in compiled_libs/search_algo.pyx so the index and the scorer agree on tokens.
+NON_WORD = re.compile(r"(?ui)\W")
+BAD_CHARS = dict((i, None) for i in range(128, 256))
+TIER_PREFIX = re.compile(r"^T\d_")
+ENCHANT_SUFFIX = re.compile(r"@\d$")
+
+CANDIDATE_LIMIT = 250
+MIN_GRAM_SHARE = 0.3
+
+
+def normalize_name(name):
+    """
+    Process a name the same way the fuzzy scorer does (ascii dammit, non word characters to spaces, lower case, strip)
+    """
+    return NON_WORD.sub(" ", name.translate(BAD_CHARS)).lower().strip()
+
+
+def name_trigrams(normalized):
+    """
+    Get the set of character trigrams of every token in a normalized name, padded with spaces at token boundaries.
+    """
+    grams = set()
+    for token in normalized.split():
+        padded = f" {token} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+def item_family(item_id):
+    """
+    Get the item id without its tier and enchant ie. T6_HEAD_LEATHER_SET3@1 -> HEAD_LEATHER_SET3
+    """
+    return ENCHANT_SUFFIX.sub("", TIER_PREFIX.sub("", item_id))
+
+
+class FacetIndex:
+    """
+    Tier / enchant / family facets over all tradable item ids, built once at load time so searches
+    narrow the ids with a dict lookup instead of scanning and copying the whole catalog.
+    """
+
+    def __init__(self, item_ids):
+        self.ids = frozenset(item_ids)
+        by_tier = defaultdict(set)
+        by_enchant = defaultdict(set)
+        by_family = defaultdict(set)
+        for item_id in self.ids:
+            # Same substring rules the search used to apply to every id per query.
+            for tier in range(1, 9):
+                if f"T{tier}" in item_id:
+                    by_tier[tier].add(item_id)
+            for enchant in range(1, 4):
+                if f"@{enchant}" in item_id:
+                    by_enchant[enchant].add(item_id)
+            by_family[item_family(item_id)].add(item_id)
+
+        self.facets = {(None, None): self.ids}
+        for tier, tier_ids in by_tier.items():
+            self.facets[(tier, None)] = frozenset(tier_ids)
+            for enchant, enchant_ids in by_enchant.items():
+                self.facets[(tier, enchant)] = frozenset(tier_ids & enchant_ids)
+        for enchant, enchant_ids in by_enchant.items():
+            self.facets[(None, enchant)] = frozenset(enchant_ids)
+        self.families = {family: frozenset(ids) for family, ids in by_family.items()}
+
+    def __contains__(self, item_id):
+        return item_id in self.ids
+
+    def lookup(self, tier=None, enchant=None):
+        """
+        Get the ids matching a tier and/or enchant, None means no filter on that facet
+        """
+        return self.facets.get((tier, enchant), frozenset())
+
+    def variants(self, item_id):
+        """
+        Get every tier and enchant of the item family this id belongs to
+        """
+        return self.families.get(item_family(item_id), frozenset())
+
+
+class NameIndex:
+    """
+    Inverted character trigram index over every localized item name.
+    Built once when the catalog loads and queried on every search to get a small candidate set
+    that is then fuzzy scored, instead of scoring the whole language list.
+    Everything but the gram lookup dict is stored in flat arrays, so it can be loaded from a catalog snapshot.
+    """
+
+    def __init__(self, ids, names, entry_items, gram_strings, gram_offsets, postings):
+        """
+        :param ids: item ids of the ItemTable the index was built from
+        :param names: PackedStrings of the normalized name of every entry
+        :param entry_items: position in ids of the item of every entry
+        :param gram_strings: PackedStrings of every trigram
+        :param gram_offsets: postings of trigram i are postings[gram_offsets[i]:gram_offsets[i + 1]]
+        :param postings: entries of every trigram, one after the other
+        """
+        self.ids = ids
+        self.names = names
+        self.entry_items = entry_items
+        self.gram_strings = gram_strings
+        self.gram_offsets = gram_offsets
+        self.postings = postings
+        self.grams = {gram: slot for slot, gram in enumerate(gram_strings)}
+
+    @classmethod
+    def build(cls, items, allowed):
+        """
+        Index the names of an ItemTable
+        :param items: ItemTable
+        :param allowed: ids of the items that can be searched
+        """
+        names = []
+        entry_items = array("I")
+        postings = defaultdict(list)
+        seen = set()
+        for name, item_id in items.language_list():
+            if item_id not in allowed:
+                continue
+            normalized = normalize_name(name)
+            # Names that normalize to nothing can never score, and many languages share the same name.
+            if not normalized or (normalized, item_id) in seen:
+                continue
+            seen.add((normalized, item_id))
+            entry = len(names)
+            names.append(normalized)
+            entry_items.append(items.positions[item_id])
+            for gram in name_trigrams(normalized):
+                postings[gram].append(entry)
+
+        # Flatten posting lists into one contiguous array, each gram points at its slice.
+        gram_offsets = array("I", [0])
+        flat_postings = array("I")
+        for entries in postings.values():
+            flat_postings.extend(entries)
+            gram_offsets.append(len(flat_postings))
+        return cls(items.ids, PackedStrings.from_strings(names), entry_items,
+                   PackedStrings.from_strings(postings), gram_offsets, flat_postings)
+
+    def sections(self):
+        """
+        Binary sections of the index for a catalog snapshot
+        """
+        return {
+            "index.names.blob": self.names.blob,
+            "index.names.offsets": self.names.offsets,
+            "index.entry_items": self.entry_items,
+            "index.grams.blob": self.gram_strings.blob,
+            "index.grams.offsets": self.gram_strings.offsets,
+            "index.gram_offsets": self.gram_offsets,
+            "index.postings": self.postings,
+        }
+
+    @classmethod
+    def from_sections(cls, ids, sections):
+        return cls(
+            ids,
+            PackedStrings(sections["index.names.blob"], sections["index.names.offsets"]),
+            sections["index.entry_items"],
+            PackedStrings(sections["index.grams.blob"], sections["index.grams.offsets"]),
+            sections["index.gram_offsets"],
+            sections["index.postings"],
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def item_id(self, entry):
+        return self.ids[self.entry_items[entry]]
+
+    def candidates(self, query, allowed=None, limit=CANDIDATE_LIMIT):
+        """
+        Get the entries sharing the most trigrams with the query
+        :param query: normalized search string
+        :param allowed: optional set of item ids to restrict the candidates to
+        :param limit: max number of candidates returned
+        :return: list of entry indexes, best overlap first
+        """
+        query_grams = name_trigrams(query)
+        if not query_grams:
+            return []
+
+        counts = defaultdict(int)
+        for gram in query_grams:
+            slot = self.grams.get(gram)
+            if slot is None:
+                continue
+            for entry in self.postings[self.gram_offsets[slot]:self.gram_offsets[slot + 1]]:
+                counts[entry] += 1
+
+        min_share = max(1, int(len(query_grams) * MIN_GRAM_SHARE))
+        found = [
+            (count, entry)
+            for entry, count in counts.items()
+            if count >= min_share and (allowed is None or self.item_id(entry) in allowed)
+        ]
+        found.sort(key=lambda pair: pair[0], reverse=True)
+        return [entry for _, entry in found[:limit]]
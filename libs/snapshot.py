@@ -0,0 +1,118 @@
+import glob
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = "data/snapshots"
+# Bump when the content of any section changes, older snapshots are then rebuilt.
+SNAPSHOT_VERSION = 3
+MAGIC = b"ALBIESNP"
+HEADER = struct.Struct("<8sII")
+ALIGNMENT = 8
+
+
+def file_digest(path):
+    """
+    sha256 of a file, read in chunks
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot_path(kind, key):
+    return os.path.join(SNAPSHOT_DIR, f"{kind}-{key[:32]}.snap")
+
+
+def write_snapshot(path, key, sections):
+    """
+    Writes named binary sections (bytes, or typed arrays like array('I')) to a snapshot file.
+    Layout: magic, version, header length, json header (key, byte order, section offsets), 8 byte aligned sections.
+    Older snapshots of the same kind are removed.
+    """
+    directory, filename = os.path.split(path)
+    os.makedirs(directory, exist_ok=True)
+
+    views = {name: memoryview(data) for name, data in sections.items()}
+    table = {}
+    offset = 0
+    for name, view in views.items():
+        table[name] = [offset, view.nbytes, view.format]
+        offset += view.nbytes + (-view.nbytes % ALIGNMENT)
+
+    header = json.dumps({"key": key, "byteorder": sys.byteorder, "sections": table}).encode("utf-8")
+    start = HEADER.size + len(header)
+    start += -start % ALIGNMENT
+
+    # A temporary file of its own, several bot processes may write the same snapshot at once.
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f"{filename}.", suffix=".tmp")
+    try:
+        with open(fd, "wb") as fp:
+            fp.write(HEADER.pack(MAGIC, SNAPSHOT_VERSION, len(header)))
+            fp.write(header)
+            fp.write(b"\0" * (start - HEADER.size - len(header)))
+            for view in views.values():
+                fp.write(view)
+                fp.write(b"\0" * (-view.nbytes % ALIGNMENT))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+    kind = filename.rsplit("-", 1)[0]
+    for old_path in glob.glob(os.path.join(directory, f"{kind}-*.snap")):
+        if old_path != path:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                # Removed by another process.
+                pass
+    log.info(f"Snapshot written to {path} ({os.path.getsize(path)} bytes)")
+
+
+def open_snapshot(path, key):
+    """
+    Memory maps a snapshot, the sections are returned as memoryviews over the shared read only mapping
+    (array sections already cast to their type), nothing is copied.
+    :return: dict of sections, None if there is no valid snapshot for this key
+    """
+    try:
+        with open(path, "rb") as fp:
+            mapping = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    view = memoryview(mapping)
+    try:
+        magic, version, header_length = HEADER.unpack_from(view)
+        if magic != MAGIC or version != SNAPSHOT_VERSION:
+            return None
+        header = json.loads(bytes(view[HEADER.size:HEADER.size + header_length]))
+        if header["key"] != key or header["byteorder"] != sys.byteorder:
+            return None
+    except (struct.error, ValueError, KeyError):
+        log.warning(f"Ignoring unreadable snapshot {path}")
+        return None
+
+    start = HEADER.size + header_length
+    start += -start % ALIGNMENT
+    sections = {}
+    try:
+        for name, (offset, length, typecode) in header["sections"].items():
+            section = view[start + offset:start + offset + length]
+            if len(section) != length:
+                raise ValueError(f"section {name} is truncated")
+            sections[name] = section if typecode == "B" else section.cast(typecode)
+    except (TypeError, ValueError) as e:
+        log.warning(f"Ignoring unreadable snapshot {path}: {e!r}")
+        return None
+    return sections
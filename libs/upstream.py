@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import random
+from time import monotonic
+
+log = logging.getLogger(__name__)
+
+# albion-data allows about 180 requests a minute and 300 every five minutes.
+REQUEST_RATE = 1.0
+MIN_REQUEST_RATE = 0.1
+MAX_REQUEST_RATE = 3.0
+REQUEST_BURST = 10
+# Requests per second added after every success, and the factor the rate is cut by when throttled.
+RATE_INCREASE = 0.05
+RATE_DECREASE = 0.5
+
+# Attempts after the first one, and the jittered exponential backoff between them in seconds.
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+# Consecutive failures that open the circuit, and seconds it stays open before a trial request.
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30.0
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket in front of the upstream api. Its rate adapts to the api (AIMD): it grows a little with every
+    successful request and is cut in half when the api throttles us or fails, down to min_rate.
+    Callers are served in order.
+    """
+
+    def __init__(self, rate=REQUEST_RATE, burst=REQUEST_BURST, min_rate=MIN_REQUEST_RATE, max_rate=MAX_REQUEST_RATE,
+                 increase=RATE_INCREASE, decrease=RATE_DECREASE):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.throttles = 0
+        self.waiting = 0
+        self._tokens = burst
+        self._updated = monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """
+        Waits for a token
+        """
+        self.waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    pause = self._paused_until - monotonic()
+                    if pause > 0:
+                        await asyncio.sleep(pause)
+                    self._refill()
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+
+    def succeeded(self):
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def throttled(self, retry_after=None):
+        """
+        The api throttled us or failed, slow down
+        :param retry_after: seconds the api asked us to wait, if it did
+        """
+        self.throttles += 1
+        self._refill()
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        if retry_after:
+            self._paused_until = max(self._paused_until, monotonic() + retry_after)
+        log.warning(f"Upstream throttled, request rate lowered to {self.rate:.2f}/s")
+
+    @property
+    def stats(self):
+        return {"rate": round(self.rate, 2), "throttles": self.throttles, "waiting": self.waiting}
+
+
+class CircuitBreaker:
+    """
+    Stops calling the upstream api after failure_threshold consecutive failures.
+    After reset_timeout seconds one trial request is let through (half open): success closes the circuit,
+    failure opens it again. A trial that reports neither within reset_timeout (cancelled, or ended by an
+    unexpected error) is taken as abandoned and another one is let through.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = None
+        # When the trial request in flight was let through, None if there is none.
+        self._trial_at = None
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        if monotonic() - self._opened_at < self.reset_timeout:
+            return "open"
+        return "half open"
+
+    def allow(self):
+        """
+        :return: whether a request may be sent now
+        """
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half open" and (
+                self._trial_at is None or monotonic() - self._trial_at >= self.reset_timeout
+        ):
+            self._trial_at = monotonic()
+            return True
+        return False
+
+    def succeeded(self):
+        if self._opened_at is not None:
+            log.info("Upstream recovered, circuit closed.")
+        self.failures = 0
+        self._opened_at = None
+        self._trial_at = None
+
+    def failed(self):
+        self.failures += 1
+        if self._trial_at is not None or (self._opened_at is None and self.failures >= self.failure_threshold):
+            if self._opened_at is None:
+                self.opened += 1
+                log.error(f"Upstream failed {self.failures} times in a row, circuit opened.")
+            self._opened_at = monotonic()
+            self._trial_at = None
+
+    @property
+    def stats(self):
+        return {"state": self.state, "failures": self.failures, "opened": self.opened}
+
+
+def backoff(attempt, retry_after=None):
+    """
+    Seconds to wait before retry number attempt + 1: full jitter over an exponential ceiling,
+    at least what the api asked for
+    """
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    return max(delay, retry_after or 0)
+
+
+def retry_after(headers):
+    """
+    Seconds of a Retry-After header, None if it is missing or a date
+    """
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+limiter = AdaptiveRateLimiter()
+breaker = CircuitBreaker()
@@ -1,39 +1,194 @@
+import asyncio
 import json
-from urllib import request
+import logging
+import os
+import sys
 
-from aiohttp import ClientSession
+from aiohttp import ClientError, ClientResponseError, ClientTimeout, ContentTypeError
 from numpy.core import float64
 
-session = ClientSession()
+from libs import upstream
+from libs.cache import SingleFlight
+from libs.errors import UpstreamUnavailable
+from libs.http_client import get_session
+
+try:
+    # orjson decodes api responses and dumps several times faster than json.
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+try:
+    # ijson parses the dumps one item at a time instead of building the whole document.
+    import ijson
+except ImportError:
+    ijson = None
+
+log = logging.getLogger(__name__)
+upstream_requests = SingleFlight()
+
+# Seconds before giving up on a dump download and using the cached copy.
+DOWNLOAD_TIMEOUT = 60
+# Bytes of a dump read from the connection and written out at a time.
+DOWNLOAD_CHUNK_SIZE = 2 ** 20
 
 
 async def get_data(url):
     """
-    Gets the data from the url and converts to Json
+    Gets the data from the url and converts to Json.
+    Concurrent requests for the same url share one upstream request.
     :param url:
     :return:
     """
-    # data = r.get(url).json()
+    return await upstream_requests.do(url, lambda: fetch_json(url))
 
-    async with session.get(url) as resp:
-        data = await resp.json()
 
-    return data
+async def fetch_json(url):
+    """
+    Gets json from the albion-data api at the rate limiter's pace. Throttled (429), failed (5xx), empty and
+    unreachable responses are retried with jittered backoff, other client errors are raised as they are.
+    :raises UpstreamUnavailable: while the circuit breaker is open or once every attempt failed
+    """
+    error = None
+    for attempt in range(upstream.MAX_RETRIES + 1):
+        if not upstream.breaker.allow():
+            raise UpstreamUnavailable(f"Circuit open, not requesting {url}")
+        await upstream.limiter.acquire()
+        wait = None
+        try:
+            async with get_session().get(url) as resp:
+                if resp.status == 429 or resp.status >= 500:
+                    wait = upstream.retry_after(resp.headers)
+                    upstream.limiter.throttled(wait)
+                    error = f"HTTP {resp.status}"
+                else:
+                    resp.raise_for_status()
+                    data = await resp.json(loads=json_loads)
+                    if data is not None:
+                        upstream.breaker.succeeded()
+                        upstream.limiter.succeeded()
+                        return data
+                    error = "empty response"
+        except ContentTypeError as e:
+            error = f"not json ({e.message})"
+        except ClientResponseError:
+            # The api answered, the request was wrong.
+            upstream.breaker.succeeded()
+            raise
+        except (ClientError, asyncio.TimeoutError, ValueError) as e:
+            error = repr(e)
+
+        upstream.breaker.failed()
+        log.warning(f"Attempt {attempt + 1} at {url} failed: {error}")
+        if attempt < upstream.MAX_RETRIES:
+            await asyncio.sleep(upstream.backoff(attempt, wait))
+    raise UpstreamUnavailable(f"{url}: {error}")
 
 
 def get_thumbnail_url(item_name):
     return f"https://render.albiononline.com/v1/item/{item_name}.png?count=1&quality=1"
 
 
-def download_file_with_fallback(url_, fallback_path):
+def load_json_file(path):
+    with open(path, "rb") as fp:
+        return json_loads(fp.read())
+
+
+def iter_json_array(path):
+    """
+    Yields the elements of a json file holding an array, streamed one element at a time when ijson is installed.
+    """
+    if ijson is None:
+        yield from load_json_file(path)
+        return
+    with open(path, "rb") as fp:
+        yield from ijson.items(fp, "item", use_float=True)
+
+
+def peak_rss_mib():
+    """
+    Peak resident memory of the process in MiB, None where the platform does not report it
+    """
     try:
-        with request.urlopen(url_) as url:
-            data = json.loads(url.read().decode())
-    except Exception:
-        # Use fallback list of local items if download fails
-        with open(fallback_path, "r", encoding="utf-8") as fp:
-            data = json.load(fp)
-    return data
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, KiB elsewhere.
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def write_file_atomic(path, content):
+    """
+    Writes bytes to a temporary file next to path and moves it in place, so readers never see a partial file.
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as fp:
+        fp.write(content)
+    os.replace(temp_path, path)
+
+
+async def stream_to_file(resp, path):
+    """
+    Writes a response body to a temporary file next to path chunk by chunk and moves it in place once complete,
+    the body is never held in memory whole.
+    :return: bytes written
+    """
+    temp_path = f"{path}.tmp"
+    size = 0
+    fp = await asyncio.to_thread(open, temp_path, "wb")
+    try:
+        async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+            await asyncio.to_thread(fp.write, chunk)
+            size += len(chunk)
+    except BaseException:
+        fp.close()
+        os.remove(temp_path)
+        raise
+    fp.close()
+    os.replace(temp_path, path)
+    return size
+
+
+async def download_file(url_, fallback_path, timeout=DOWNLOAD_TIMEOUT):
+    """
+    Downloads a dump into its local cache file.
+    The ETag / Last-Modified of the cached copy are sent along, so an unchanged dump comes back as a 304.
+    If the download fails or times out the cached copy is used.
+    :param url_: url of the dump
+    :param fallback_path: local cache file of the dump
+    :param timeout: total seconds allowed for the download
+    :return: fallback_path
+    """
+    meta_path = f"{fallback_path}.meta"
+    headers = {}
+    if os.path.exists(fallback_path) and os.path.exists(meta_path):
+        meta = await asyncio.to_thread(load_json_file, meta_path)
+        if meta.get("url") == url_:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        async with get_session().get(url_, headers=headers, timeout=ClientTimeout(total=timeout)) as resp:
+            if resp.status == 304:
+                log.info(f"{url_} not modified, using {fallback_path}")
+            else:
+                resp.raise_for_status()
+                size = await stream_to_file(resp, fallback_path)
+                meta = {
+                    "url": url_,
+                    "etag": resp.headers.get("ETag"),
+                    "last_modified": resp.headers.get("Last-Modified"),
+                }
+                await asyncio.to_thread(write_file_atomic, meta_path, json.dumps(meta).encode())
+                log.info(f"Downloaded {url_} ({size} bytes)")
+    except (ClientError, asyncio.TimeoutError) as e:
+        # Use the local copy of the dump if download fails
+        log.warning(f"Could not download {url_}, using {fallback_path}: {e!r}")
+
+    return fallback_path
 
 
 def c_game_currency(no):
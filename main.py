@@ -5,6 +5,10 @@ import os
 from discord import Game, Intents
 from discord.ext import commands
 
+from libs import http_client
+from libs.charts import renderer
+from libs.item_handler import history_store, price_cache
+
 # Load config.ini
 current_path = os.path.dirname(os.path.realpath(__file__))
 
@@ -24,6 +28,22 @@ class Server(commands.AutoShardedBot):
     def __init__(self, command_prefix, intents, *args, **kwargs):
         super().__init__(command_prefix=command_prefix, intents=intents, *args, **kwargs)
 
+    async def setup_hook(self) -> None:
+        # One HTTP client for every cog, created once the event loop runs.
+        await http_client.start()
+        # Charts are rendered in worker processes, off the event loop.
+        renderer.start()
+        # Price history and cached prices are kept in SQLite, opened here so importing the cogs does not create the dbs.
+        history_store.start()
+        price_cache.start()
+
+    async def close(self) -> None:
+        await super().close()
+        await http_client.close()
+        renderer.close()
+        history_store.close()
+        price_cache.close()
+
 
 client = Server(command_prefix='.', intents=Intents.default(), case_insensitive=True)
 